@@ -0,0 +1,86 @@
+# Serving /course/all: building and serializing the response on every
+# request vs answering from the catalog snapshot (200 and 304).
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.catalog_snapshot
+import asyncio
+import datetime
+import time
+
+from starlette.requests import Request
+
+from src.course.schemas import (
+    AllCoursesOut,
+    CourseSchema,
+    CourseSectionCount,
+    CourseSectionSchema,
+    DayOfWeek,
+    Unit,
+)
+from src.course.service import CatalogSnapshot
+from src.instructor.schemas import InstructorSchema
+
+REQUESTS = 50_000
+COURSES = 24
+
+
+def build_response() -> AllCoursesOut:
+    instructor = InstructorSchema(
+        id=1,
+        first_name="bench",
+        last_name="bench",
+        national_id="0000000000",
+        email="bench@example.com",
+        username="bench",
+        phone_number="09120000000",
+        birth_day=datetime.date(1980, 1, 1),
+    )
+    courses = [
+        CourseSchema(
+            id=i,
+            name=f"course {i}",
+            short_name=f"c{i}",
+            instructor=instructor,
+            sections_count=CourseSectionCount.two,
+            unit=Unit.three,
+            importance=1,
+            sections=[
+                CourseSectionSchema(
+                    id=2 * i + j, day_of_week=DayOfWeek(j), start_time=8, end_time=10
+                )
+                for j in range(2)
+            ],
+        )
+        for i in range(COURSES)
+    ]
+    return AllCoursesOut(courses=courses, count=len(courses))
+
+
+def request(etag=None) -> Request:
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "headers": headers})
+
+
+async def timed(name, call):
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await call()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<22} {REQUESTS / elapsed:>9.0f} req/s")
+
+
+async def main():
+    async def build():
+        return build_response()
+
+    async def uncached():
+        (await build()).model_dump_json().encode()
+
+    snapshot = CatalogSnapshot(1)
+    etag = (await snapshot.get("all", build))[0]
+    await timed("build + serialize", uncached)
+    await timed("snapshot 200", lambda: snapshot.respond(request(), "all", build))
+    await timed("snapshot 304", lambda: snapshot.respond(request(etag), "all", build))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+# Cold start of a deployment: `workers` processes start at once against the
+# same database, the way uvicorn/gunicorn workers do, and each reports how
+# long importing the app and running its lifespan startup took. The first
+# run on an empty database pays for the schema once; every run after that
+# only checks the stored schema version.
+# Run from the project root (needs the usual .env and Postgres):
+#   python -m benchmarks.cold_start [workers]
+import asyncio
+import json
+import sys
+import time
+
+WORKERS = 4
+
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+from src.app import lifespan
+from src.main import app
+from src.bootstrap import bootstrap
+imported = time.perf_counter()
+
+async def run():
+    async with lifespan(app):
+        pass
+
+asyncio.run(run())
+print(json.dumps({
+    "import": imported - started,
+    "bootstrap": bootstrap.bootstrap_seconds,
+    "ready": bootstrap.cold_start_seconds,
+    "migrated": bootstrap.migrated,
+}))
+"""
+
+
+async def worker() -> dict:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-c",
+        WORKER,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    out, _ = await process.communicate()
+    assert process.returncode == 0, "worker failed to start"
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+async def main(workers: int):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+    for i, result in enumerate(results):
+        print(
+            f"worker {i:>2}  import {result['import'] * 1000:>7.0f} ms"
+            f"  bootstrap {result['bootstrap'] * 1000:>7.0f} ms"
+            f"  ready {result['ready'] * 1000:>7.0f} ms"
+            f"  migrated {result['migrated']}"
+        )
+    print(f"all {workers} workers ready in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [WORKERS][len(args) :])))
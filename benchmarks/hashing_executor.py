@@ -0,0 +1,89 @@
+# Login burst: bcrypt on the default executor vs the dedicated hashing pools.
+# Prints throughput, per-call latency and how late a 10 ms event loop ticker
+# ran while the burst was hashed. Every function the app hands to the
+# hashing executor is first run once on each kind of pool, so one that a
+# process pool can not pickle fails here.
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.hashing_executor [requests] [workers]
+import asyncio
+import sys
+import time
+
+from src.authentication.service import HashingExecutor
+from src.authentication.utils import (
+    dummy_verify,
+    hash_password,
+    to_async,
+    verify_pwd,
+)
+from src.exceptions import GlobalException
+
+REQUESTS = 64
+WORKERS = 4
+TICK = 0.01
+
+
+async def ticker(lags):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def run(name, requests, verify):
+    hashed = hash_password("benchmark")
+    latencies = []
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        started = time.perf_counter()
+        try:
+            assert (await verify("benchmark", hashed))[0]
+        except GlobalException:
+            rejected += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    lags = []
+    tick = asyncio.create_task(ticker(lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    tick.cancel()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    worst = latencies[-1] if latencies else 0.0
+    print(
+        f"{name:<16} {len(latencies) / elapsed:>7.1f} verify/s"
+        f"  p50 {p50 * 1000:>7.1f} ms  max {worst * 1000:>7.1f} ms"
+        f"  loop lag {max(lags, default=0) * 1000:>6.1f} ms  rejected {rejected}"
+    )
+
+
+async def check(executor: HashingExecutor):
+    # hash_password_async, verify_pwd_async and dummy_verify_async
+    hashed = await executor.run(hash_password, "benchmark")
+    assert (await executor.run(verify_pwd, "benchmark", hashed))[0]
+    await executor.run(dummy_verify)
+
+
+async def main(requests: int, workers: int):
+    await run("default executor", requests, lambda *a: to_async(verify_pwd, *a))
+    for kind in ("thread", "process"):
+        executor = HashingExecutor(kind, workers, max_queue=requests)
+        await check(executor)
+        await run(kind, requests, lambda *a: executor.run(verify_pwd, *a))
+        executor.shutdown()
+
+    # Same burst against a short queue: the surplus is turned away at once
+    executor = HashingExecutor("thread", workers, max_queue=workers)
+    await run("thread, short q", requests, lambda *a: executor.run(verify_pwd, *a))
+    print(executor.stats())
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [REQUESTS, WORKERS][len(args) :])))
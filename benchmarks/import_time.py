@@ -0,0 +1,78 @@
+# Import-time budget of a worker: `python -X importtime` on the full app and
+# on an app factory build of every single router, the median of `runs`
+# fresh interpreters each, plus the top level packages that cost the most.
+# Exits with 1 when the full app imports slower than the budget, so a new
+# heavy import at module level shows up as a regression.
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.import_time [runs] [budget ms]
+import asyncio
+import statistics
+import sys
+from collections import Counter
+from typing import Dict, Tuple
+
+from src.app import ROUTERS
+
+RUNS = 5
+BUDGET_MS = 800
+TOP = 10
+
+
+def parse(stderr: str) -> Tuple[int, Dict[str, int]]:
+    # Total microseconds, and the microseconds spent in every top level
+    # package's own modules
+    total = 0
+    packages: Counter = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "| imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            total += int(cumulative)
+        packages[name.strip().split(".")[0]] += int(own)
+    return total, packages
+
+
+async def measure(code: str, runs: int) -> Tuple[float, Counter]:
+    # Median total in ms, and the packages in ms averaged over the runs
+    totals = []
+    packages: Counter = Counter()
+    for _ in range(runs):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            code,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, err = await process.communicate()
+        assert process.returncode == 0, err.decode()
+        total, own = parse(err.decode())
+        totals.append(total)
+        for package, microseconds in own.items():
+            packages[package] += microseconds / runs / 1000
+    return statistics.median(totals) / 1000, packages
+
+
+async def main(runs: int, budget: int):
+    full_ms, packages = await measure("import src.main", runs)
+    print(f"{'full app':<20} {full_ms:>7.0f} ms")
+    for name in ROUTERS:
+        ms, _ = await measure(
+            f"from src.app import create_app; create_app([{name!r}])", runs
+        )
+        print(f"{'only ' + name:<20} {ms:>7.0f} ms")
+
+    print(f"\ntop {TOP} packages of the full app, own modules only")
+    for package, ms in packages.most_common(TOP):
+        print(f"  {package:<18} {ms:>7.0f} ms")
+
+    if full_ms > budget:
+        print(f"\nfull app imports in {full_ms:.0f} ms, over the {budget} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [RUNS, BUDGET_MS][len(args) :])))
@@ -0,0 +1,101 @@
+# Password reset mail burst against a local aiosmtpd server: one SMTP
+# connection per message (what forget_password used to do) versus the mail
+# queue's workers reusing theirs. Needs aiosmtpd (requirements/dev.txt).
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.mail_queue [messages]
+import asyncio
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+from src.authentication.mail import MailQueue
+from src.config import config
+
+MESSAGES = 1000
+# Requests sending inline at the same time
+CONCURRENCY = 50
+PORT = 8025
+
+
+class Counter:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def message(i: int) -> MessageSchema:
+    return MessageSchema(
+        subject="Reset password instructions",
+        recipients=[f"student{i}@example.com"],
+        body=f"<a href='https://example.com/reset/{i}'>Click here</a>",
+        subtype=MessageType.html,
+    )
+
+
+async def wait_for(counter: Counter, received: int):
+    while counter.received < received:
+        await asyncio.sleep(0.01)
+
+
+async def main(messages: int):
+    counter = Counter()
+    controller = Controller(counter, hostname="127.0.0.1", port=PORT)
+    controller.start()
+    conf = ConnectionConfig(
+        MAIL_USERNAME="bench",
+        MAIL_PASSWORD="bench",
+        MAIL_FROM="noreply@example.com",
+        MAIL_PORT=PORT,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+    mail = FastMail(conf)
+    limit = asyncio.Semaphore(CONCURRENCY)
+
+    async def inline(i):
+        async with limit:
+            await mail.send_message(message(i))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(inline(i) for i in range(messages)))
+    await wait_for(counter, messages)
+    elapsed = time.perf_counter() - started
+    print(f"inline   {messages / elapsed:>7.0f} mails/s  {messages} connections")
+
+    queue = MailQueue(
+        conf,
+        size=messages,
+        workers=config.MAIL_WORKERS,
+        batch_size=config.MAIL_BATCH_SIZE,
+        retries=config.MAIL_RETRIES,
+        backoff=config.MAIL_RETRY_BACKOFF_SECONDS,
+        idle_seconds=config.MAIL_IDLE_SECONDS,
+    )
+    started = time.perf_counter()
+    for i in range(messages):
+        queue.submit(message(i))
+    submitted = time.perf_counter() - started
+    await wait_for(counter, 2 * messages)
+    elapsed = time.perf_counter() - started
+    print(
+        f"queued   {messages / elapsed:>7.0f} mails/s"
+        f"  {queue.stats().connections} connections"
+        f"  submit {submitted / messages * 1e6:.0f} us/request"
+    )
+    print(queue.stats())
+    await queue.stop()
+    controller.stop()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [MESSAGES][len(args) :])))
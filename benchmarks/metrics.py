@@ -0,0 +1,111 @@
+# Cost of the request metrics: a bare route called through ASGI with and
+# without MetricsMiddleware, then a /metrics scrape of the app while
+# `concurrency` requests are in flight, checked for the in-flight gauge and
+# the request histogram. No database needed.
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.metrics [requests] [concurrency]
+import asyncio
+import sys
+import time
+
+from fastapi import FastAPI
+
+from src.metrics import MetricsMiddleware, get_metrics
+
+REQUESTS = 20_000
+CONCURRENCY = 50
+
+
+def build(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        await asyncio.sleep(0)
+        return {"ok": True}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def call(app, path: str = "/ping") -> bytes:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def run(name: str, app, requests: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with limit:
+            await call(app)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    per = (time.perf_counter() - started) / requests * 1e6
+    print(f"{name:<16} {per:>7.1f} us/request")
+    return per
+
+
+async def main(requests: int, concurrency: int):
+    plain = await run("no metrics", build(False), requests, concurrency)
+    app = build(True)
+    timed = await run("MetricsMiddleware", app, requests, concurrency)
+    print(f"{'overhead':<16} {timed - plain:>7.1f} us/request")
+
+    # Scrape while requests are in flight, the way Prometheus would
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+
+    app.add_api_route("/slow", slow)
+    in_flight = [asyncio.create_task(call(app, "/slow")) for _ in range(concurrency)]
+    await asyncio.sleep(0.1)
+    started = time.perf_counter()
+    text = get_metrics().render()
+    elapsed = time.perf_counter() - started
+    release.set()
+    await asyncio.gather(*in_flight)
+
+    lines = text.splitlines()
+    gauge = next(line for line in lines if line.startswith("http_requests_in_flight "))
+    count = next(
+        line
+        for line in lines
+        if line.startswith("http_request_duration_seconds_count")
+        and 'route="/ping"' in line
+    )
+    print(f"scrape           {elapsed * 1000:>7.2f} ms, {len(lines)} lines")
+    print(gauge)
+    print(count)
+    assert gauge.endswith(f" {concurrency}")
+    assert count.endswith(f" {requests}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [REQUESTS, CONCURRENCY][len(args) :])))
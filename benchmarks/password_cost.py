@@ -0,0 +1,53 @@
+# Login throughput per bcrypt cost: a burst of verifies on the hashing
+# executor for every cost, so operators can pick BCRYPT_ROUNDS knowing what
+# each step costs in CPU. Every step up doubles the work.
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.password_cost [requests] [min cost] [max cost]
+import asyncio
+import sys
+import time
+
+from passlib.context import CryptContext
+
+from src.authentication.service import HashingExecutor
+from src.config import config
+
+REQUESTS = 32
+MIN_COST = 8
+MAX_COST = 13
+
+
+async def run(cost: int, requests: int):
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=cost)
+    hashed = context.hash("benchmark")
+    executor = HashingExecutor(
+        config.HASHING_EXECUTOR, config.HASHING_WORKERS, max_queue=requests
+    )
+    latencies = []
+
+    async def one():
+        started = time.perf_counter()
+        assert await executor.run(context.verify, "benchmark", hashed)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+
+    latencies.sort()
+    print(
+        f"cost {cost:>2}  {requests / elapsed:>8.1f} logins/s"
+        f"  p50 {latencies[len(latencies) // 2] * 1000:>8.1f} ms"
+        f"  max {latencies[-1] * 1000:>8.1f} ms"
+    )
+
+
+async def main(requests: int, min_cost: int, max_cost: int):
+    for cost in range(min_cost, max_cost + 1):
+        await run(cost, requests)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [REQUESTS, MIN_COST, MAX_COST][len(args) :])))
@@ -0,0 +1,72 @@
+# Synthetic catalog benchmark for the timetable solver.
+# Run from the project root: python -m benchmarks.scheduler
+import random
+import sys
+import time
+
+from src.course.constants import WEEK_SLOTS
+from src.course.schemas import FULL_WEEK
+from src.scheduler.solver import SchedulingProblem, build_neighbours, solve
+
+SIZES = [500, 1000, 2000, 5000, 10000]
+COURSES_PER_INSTRUCTOR = 3
+STUDENTS_PER_COURSE = 5
+RESERVATIONS_PER_STUDENT = 6
+MAJORS = 40
+
+
+def synthetic_problem(courses: int, seed: int = 0) -> SchedulingProblem:
+    rnd = random.Random(seed)
+    instructors = max(1, courses // COURSES_PER_INSTRUCTOR)
+    availability = []
+    for _ in range(instructors):
+        mask = 0
+        for slot in rnd.sample(range(WEEK_SLOTS), 20):
+            mask |= 1 << slot
+        availability.append(mask)
+
+    teachers = []
+    allowed = []
+    for _ in range(courses):
+        t = rnd.randrange(instructors)
+        teachers.append((t,))
+        allowed.append(FULL_WEEK & availability[t])
+
+    # Students of the same major mostly reserve courses of that major
+    major_courses = [list(range(m, courses, MAJORS)) for m in range(MAJORS)]
+    reservations = []
+    for _ in range(courses * STUDENTS_PER_COURSE):
+        pool = major_courses[rnd.randrange(MAJORS)]
+        reservations.append(rnd.sample(pool, min(RESERVATIONS_PER_STUDENT, len(pool))))
+
+    return SchedulingProblem(
+        course_ids=list(range(1, courses + 1)),
+        sections_needed=[rnd.choice((1, 2)) for _ in range(courses)],
+        importance=[rnd.randrange(10) for _ in range(courses)],
+        teachers=teachers,
+        allowed=allowed,
+        neighbours=build_neighbours(courses, reservations),
+        instructors_count=instructors,
+    )
+
+
+def main(sizes):
+    print(
+        f"{'courses':>8} {'build(s)':>9} {'solve(s)':>9} {'unsched':>8} {'clashes':>8}"
+    )
+    for size in sizes:
+        started = time.perf_counter()
+        problem = synthetic_problem(size)
+        built = time.perf_counter() - started
+
+        started = time.perf_counter()
+        solution = solve(problem)
+        solved = time.perf_counter() - started
+        print(
+            f"{size:>8} {built:>9.3f} {solved:>9.3f} "
+            f"{len(solution.unscheduled):>8} {solution.student_conflicts:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
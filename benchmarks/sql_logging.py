@@ -0,0 +1,72 @@
+# Per statement cost of the SQL diagnostics: no logging, the old echo=True,
+# and QueryStats logging none, 1% and all of the statements through the log
+# queue. Runs a small SELECT on in-memory SQLite, so the relative overhead
+# here is far above what it is next to a Postgres round trip. Log output
+# goes to /dev/null.
+# Run from the project root (needs the usual .env):
+#   python -m benchmarks.sql_logging [statements]
+import contextlib
+import logging
+import os
+import sys
+import time
+
+import sqlalchemy as sa
+
+from src.instrumentation import QueryStats
+from src.logs import LogQueue
+
+STATEMENTS = 50_000
+SAMPLE_RATES = (0, 0.01, 1)
+
+table = sa.table("t", sa.column("id"), sa.column("name"))
+STATEMENT = sa.select(table).where(table.c.id == sa.bindparam("id"))
+
+
+def engine(echo: bool = False) -> sa.Engine:
+    engine = sa.create_engine("sqlite://", echo=echo)
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(
+            sa.text("INSERT INTO t VALUES (:id, :name)"),
+            [{"id": i, "name": f"name {i}"} for i in range(100)],
+        )
+    return engine
+
+
+def run(engine: sa.Engine, statements: int) -> float:
+    # Microseconds per statement
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        for i in range(statements):
+            conn.execute(STATEMENT, {"id": i % 100}).all()
+        elapsed = time.perf_counter() - started
+    return elapsed / statements * 1e6
+
+
+def main(statements: int):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sys.stderr, stderr = devnull, sys.stderr
+        results = []
+        results.append(("no diagnostics", run(engine(), statements)))
+        results.append(("echo=True", run(engine(echo=True), statements)))
+        logging.getLogger("sqlalchemy.engine").handlers.clear()
+
+        log_queue = LogQueue(statements, "INFO")
+        log_queue.start()
+        for rate in SAMPLE_RATES:
+            instrumented = engine()
+            QueryStats(slow_ms=1000, sample_rate=rate).instrument(instrumented)
+            name = f"QueryStats, {rate:.0%} logged"
+            results.append((name, run(instrumented, statements)))
+        log_queue.stop()
+        sys.stderr = stderr
+
+    baseline = results[0][1]
+    for name, per in results:
+        print(f"{name:<24} {per:>7.1f} us/statement  +{per - baseline:>5.1f} us")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [STATEMENTS][len(args) :]))
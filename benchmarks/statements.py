@@ -0,0 +1,99 @@
+# CPU time per request spent on the hot statements: built per request as
+# before versus the pre-built ones of src/statements.py. Each execution goes
+# through the same step an engine runs before it talks to the database
+# (statement cache key, compiled cache lookup for the asyncpg dialect), so
+# no Postgres is needed. Run from the project root:
+#   python -m benchmarks.statements [iterations]
+import asyncio
+import sys
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from sqlalchemy.util import LRUCache
+
+from src import statements
+from src.config import config
+from src.course.models import Course, CourseSection
+from src.course.models import CourseSectionToCourseAssociation as Sections
+from src.models import Admin
+from src.student.models import ReservedCourse, Student
+
+ITERATIONS = 20_000
+
+
+def timed(name, iterations, run):
+    started = time.process_time()
+    for i in range(iterations):
+        run(i)
+    elapsed = time.process_time() - started
+    print(f"{name:<28} {elapsed / iterations * 1e6:>7.1f} us")
+
+
+async def main(iterations: int):
+    dialect = PGDialect_asyncpg()
+    cache = LRUCache(config.SQL_COMPILED_CACHE_SIZE)
+
+    def execute(statement, params=None):
+        statement._compile_w_cache(
+            dialect, compiled_cache=cache, column_keys=sorted(params or ())
+        )
+
+    def login_before(i):
+        execute(sa.select(Student).where(Student.username == "s1"))
+        execute(sa.select(Admin).where(Admin.username == "s1"))
+
+    def login_after(i):
+        execute(statements.CREDENTIALS_BY_USERNAME, {"username": "s1"})
+
+    def principal_before(i):
+        execute(sa.select(Student).where(Student.id == "s1"))
+
+    def principal_after(i):
+        execute(statements.STUDENT_BY_ID, {"user_id": "s1"})
+
+    def reserve_before(i):
+        execute(
+            sa.select(
+                ReservedCourse.course_id,
+                Course.unit,
+                CourseSection.day_of_week,
+                CourseSection.start_time,
+            )
+            .join(Course, Course.id == ReservedCourse.course_id)
+            .outerjoin(Sections, Sections.course_id == ReservedCourse.course_id)
+            .outerjoin(CourseSection, CourseSection.id == Sections.course_section_id)
+            .where(ReservedCourse.student_id == "s1")
+        )
+        execute(
+            sa.select(Course, CourseSection.day_of_week, CourseSection.start_time)
+            .outerjoin(Sections, Sections.course_id == Course.id)
+            .outerjoin(CourseSection, CourseSection.id == Sections.course_section_id)
+            .where(Course.id == 1)
+        )
+
+    def reserve_after(i):
+        execute(statements.STUDENT_SCHEDULE, {"student_id": "s1"})
+        execute(statements.COURSE_SLOTS, {"course_id": 1})
+
+    def catalog_before(i):
+        # The page used to add its WHERE and LIMIT to a prepared base query,
+        # a new statement whose cache key has to cover the whole tree again
+        execute(statements.CATALOG_PAGE.where(Course.id > i).limit(100))
+
+    def catalog_after(i):
+        execute(statements.CATALOG_PAGE, {"after": i, "limit": 100})
+
+    for name, before, after in [
+        ("login", login_before, login_after),
+        ("principal lookup", principal_before, principal_after),
+        ("reservation checks", reserve_before, reserve_after),
+        ("catalog page", catalog_before, catalog_after),
+    ]:
+        timed(f"{name} built", iterations, before)
+        timed(f"{name} pre-built", iterations, after)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [ITERATIONS][len(args) :])))
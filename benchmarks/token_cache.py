@@ -0,0 +1,36 @@
+# Cost of turning a bearer token into TokenData: jwt.decode + validation on
+# every request vs the verified token cache.
+# Run from the project root (needs the usual .env): python -m benchmarks.token_cache
+import timeit
+import uuid
+
+import jwt
+
+from src.authentication.constants import ALGORITHM
+from src.authentication.schemas import TokenData
+from src.authentication.service import get_token_cache
+from src.authentication.utils import create_tokens, decode_access_token
+from src.config import config
+from src.schemas import UserRole
+
+REQUESTS = 50_000
+
+
+def uncached(token: str) -> TokenData:
+    payload = jwt.decode(token, config.SECRET, algorithms=[ALGORITHM])
+    return TokenData(**payload)
+
+
+def main():
+    token = create_tokens(1, UserRole.STUDENT, uuid.uuid4().hex).access_token
+
+    elapsed = timeit.timeit(lambda: uncached(token), number=REQUESTS)
+    print(f"jwt.decode + TokenData {elapsed / REQUESTS * 1e6:8.2f} us/request")
+
+    get_token_cache().entries.clear()
+    elapsed = timeit.timeit(lambda: decode_access_token(token), number=REQUESTS)
+    print(f"decode_access_token    {elapsed / REQUESTS * 1e6:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
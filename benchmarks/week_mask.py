@@ -0,0 +1,81 @@
+# Section conflict checks: WeekMask bit operations vs the SQL count() query.
+# Run from the project root: python -m benchmarks.week_mask
+# Set DATABASE_URL (postgresql+asyncpg://...) to also time the database round-trip.
+import asyncio
+import os
+import random
+import time
+import timeit
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.course.models import CourseSection
+from src.course.schemas import DayOfWeek, free_slots, overlaps, slot_mask, union
+from src.student import models  # noqa: F401  (registers reserved_course mapper)
+
+CHECKS = 100_000
+QUERIES = 2_000
+
+
+def count_query(day: DayOfWeek, start: int):
+    return (
+        select(func.count(CourseSection.id))
+        .select_from(CourseSection)
+        .filter(CourseSection.day_of_week == day)
+        .filter(CourseSection.start_time == start)
+        .filter(CourseSection.end_time == start + 2)
+    )
+
+
+def per_call(seconds: float, calls: int) -> str:
+    return f"{seconds / calls * 1e6:9.3f} us/check"
+
+
+async def database_round_trip(url: str, samples):
+    engine = create_async_engine(url)
+    async with engine.connect() as conn:
+        started = time.perf_counter()
+        for day, start in samples[:QUERIES]:
+            await conn.execute(count_query(day, start))
+        elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return elapsed
+
+
+def main():
+    rnd = random.Random(0)
+    samples = [
+        (DayOfWeek(rnd.randrange(7)), 8 + 2 * rnd.randrange(6)) for _ in range(CHECKS)
+    ]
+    occupied = union(*(slot_mask(day, start) for day, start in samples[:20]))
+
+    elapsed = timeit.timeit(
+        lambda: [overlaps(occupied, slot_mask(d, s)) for d, s in samples], number=1
+    )
+    print("mask overlap          ", per_call(elapsed, CHECKS))
+    elapsed = timeit.timeit(
+        lambda: [free_slots(occupied | slot_mask(d, s)) for d, s in samples], number=1
+    )
+    print("mask union+free slots ", per_call(elapsed, CHECKS))
+
+    dialect = postgresql.asyncpg.dialect()  # type: ignore
+    elapsed = timeit.timeit(
+        lambda: [
+            count_query(d, s).compile(dialect=dialect) for d, s in samples[:QUERIES]
+        ],
+        number=1,
+    )
+    print("sql build+compile     ", per_call(elapsed, QUERIES))
+
+    url = os.environ.get("DATABASE_URL")
+    if url:
+        elapsed = asyncio.run(database_round_trip(url, samples))
+        print("sql round-trip        ", per_call(elapsed, QUERIES))
+    else:
+        print("sql round-trip         skipped (DATABASE_URL is not set)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import importlib
+import time
+from contextlib import asynccontextmanager
+from typing import Iterable
+
+from fastapi import APIRouter, FastAPI, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from src.bootstrap import bootstrap
+from src.config import config
+from src.exceptions import GlobalException
+from src.logs import get_log_queue
+from src.metrics import MetricsMiddleware, get_metrics
+from src.schemas import Readiness
+
+# Imported by create_app, only for the routers the worker serves
+ROUTERS = {
+    "auth": "src.authentication.router",
+    "instructor": "src.instructor.router",
+    "student": "src.student.router",
+    "course": "src.course.router",
+    "scheduler": "src.scheduler.router",
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # /ready answers 503 outside of this, so a balancer only routes to a
+    # worker that has its schema and drains it before it shuts down. The
+    # shared components are imported here rather than with the app, which
+    # only imports what its routers need.
+    from src.authentication.mail import get_mail_queue
+    from src.authentication.service import get_hashing_executor, get_revoked_tokens
+    from src.database import engine, get_session_maker
+    from src.invalidation import get_invalidation_listener
+    from src.student.importer import get_import_executor
+    from src.student.queue import get_reservation_queue
+
+    get_log_queue().start()
+    await bootstrap.run(engine)
+    async with get_session_maker().begin() as session:
+        await get_revoked_tokens().load(session)
+    if config.INVALIDATION_BUS_ENABLED:
+        get_invalidation_listener().start()
+    bootstrap.set_ready(True)
+    yield
+    bootstrap.set_ready(False)
+    if get_reservation_queue.cache_info().currsize:
+        # Writes what was admitted while the engine is still there
+        await get_reservation_queue().stop(config.RESERVATION_QUEUE_DRAIN_SECONDS)
+    await get_invalidation_listener().stop()
+    if get_mail_queue.cache_info().currsize:
+        # Never built when the worker sent no mail
+        await get_mail_queue().stop()
+    get_hashing_executor().shutdown()
+    if get_import_executor.cache_info().currsize:
+        get_import_executor().shutdown()
+    get_log_queue().stop()
+
+
+async def unicorn_exception_handler(request: Request, exc: GlobalException):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=exc.model.model_dump(),
+    )
+
+
+async def ready():
+    readiness = bootstrap.readiness()
+    if not readiness.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=readiness.model_dump(),
+        )
+    return readiness
+
+
+async def metrics():
+    return PlainTextResponse(
+        get_metrics().render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+origins = [
+    "*",
+]
+
+
+def create_app(routers: Iterable[str] | None = None) -> FastAPI:
+    # Builds the app with the named ROUTERS, APP_ROUTERS or all of them by
+    # default. Importing src.main builds the full app, a worker started with
+    # `uvicorn --factory src.app:create_app` imports only the routers it serves.
+    started = time.perf_counter()
+    if routers is None:
+        routers = [
+            name.strip() for name in config.APP_ROUTERS.split(",") if name.strip()
+        ] or list(ROUTERS)
+
+    app = FastAPI(debug=True, lifespan=lifespan)
+    app.exception_handler(GlobalException)(unicorn_exception_handler)
+    app.add_api_route("/ready", ready, methods=["GET"], response_model=Readiness)
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Added last, so the timing covers the other middleware too
+    app.add_middleware(MetricsMiddleware)
+    included: list[APIRouter] = [
+        importlib.import_module(ROUTERS[name]).router for name in routers
+    ]
+    for router in included:
+        app.include_router(router)
+    bootstrap.app_seconds = time.perf_counter() - started
+    return app
@@ -1,8 +1,12 @@
 from fastapi.security import OAuth2PasswordBearer
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 24 * 60
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
+REFRESH_TOKEN_EXPIRE_MINUTES = 7 * 24 * 60
 RESET_PASSWORD_EXP_TIME = 10
+HASHING_LATENCY_SAMPLES = 10_000
+# Upper bounds in seconds of the hashing latency histogram of /metrics
+HASHING_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 
 
 LOGIN_ROUTE = "/login"  # After router prefix
@@ -2,17 +2,16 @@ import datetime
 from typing import Annotated, List
 
 import jwt
-import sqlalchemy as sa
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import ValidationError
 
-from src.authentication.constants import ALGORITHM, backend
-from src.authentication.schemas import TokenData
-from src.config import config
-from src.dependencies import SessionMaker
-from src.models import Admin
+from src.authentication.constants import backend
+from src.authentication.service import get_principal_cache
+from src.authentication.utils import decode_access_token
+from src.dependencies import Session
 from src.schemas import AdminSchema, UserRole
+from src.statements import ADMIN_BY_ID
 
 BackendToken = Annotated[str, Depends(backend)]
 
@@ -56,11 +55,9 @@ BackendToken = Annotated[str, Depends(backend)]
 OAuthLoginData = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
-async def get_current_admin(maker: SessionMaker, token: BackendToken) -> AdminSchema:
+async def get_current_admin(session: Session, token: BackendToken) -> AdminSchema:
     try:
-        algs = [ALGORITHM]
-        payload = jwt.decode(token, config.SECRET, algorithms=algs)
-        token_data = TokenData(**payload)
+        token_data = decode_access_token(token)
         if token_data.role != UserRole.ADMIN:
             raise jwt.InvalidTokenError()
 
@@ -74,19 +71,22 @@ async def get_current_admin(maker: SessionMaker, token: BackendToken) -> AdminSc
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    async with maker.begin() as session:
-        result = await session.execute(
-            sa.select(Admin).where(Admin.id == token_data.user_id)
+    cache = get_principal_cache()
+    cached = cache.get(UserRole.ADMIN, token_data.user_id)
+    if isinstance(cached, AdminSchema):
+        return cached
+    result = await session.execute(ADMIN_BY_ID, {"user_id": token_data.user_id})
+    user = result.scalar_one_or_none()
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Could not find user",
         )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Could not find user",
-            )
 
-        return AdminSchema.model_validate(user)
+    admin = AdminSchema.model_validate(user)
+    cache.set(UserRole.ADMIN, token_data.user_id, admin)
+    return admin
 
 
 GetFullAdmin = Annotated[AdminSchema, Depends(get_current_admin)]
@@ -94,12 +94,9 @@ GetFullAdmin = Annotated[AdminSchema, Depends(get_current_admin)]
 
 def _allowed_by(token: BackendToken, allowed_by: List[UserRole]) -> UserRole:
     try:
-        algs = [ALGORITHM]
-        payload = jwt.decode(token, config.SECRET, algorithms=algs)
-        token_data = TokenData(**payload)
+        token_data = decode_access_token(token)
         if token_data.role is not None:
             # ADMIN HAS FULL ACCESS
-            print(allowed_by)
             if allowed_by == UserRole.ALL:
                 return token_data.role
             elif token_data.role in allowed_by or token_data.role == UserRole.ADMIN:
@@ -27,3 +27,24 @@ class NoAccess(BaseError):
     details: Literal[
         "You don't have access to request this route"
     ] = "You don't have access to request this route"
+
+
+class InvalidRefreshToken(BaseError):
+    code: Literal[ErrorCode.INVALID_REFRESH_TOKEN] = ErrorCode.INVALID_REFRESH_TOKEN
+    details: Literal[
+        "Refresh token is invalid, expired or revoked"
+    ] = "Refresh token is invalid, expired or revoked"
+
+
+class MailQueueFull(BaseError):
+    code: Literal[ErrorCode.MAIL_QUEUE_FULL] = ErrorCode.MAIL_QUEUE_FULL
+    details: Literal[
+        "too many emails waiting to be sent, try again later."
+    ] = "too many emails waiting to be sent, try again later."
+
+
+class HashingBusy(BaseError):
+    code: Literal[ErrorCode.HASHING_BUSY] = ErrorCode.HASHING_BUSY
+    details: Literal[
+        "too many password checks in progress, try again."
+    ] = "too many password checks in progress, try again."
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, List
+
+from fastapi import status
+
+from src.authentication.exceptions import MailQueueFull
+from src.authentication.schemas import MailQueueStats
+from src.config import config
+from src.exceptions import GlobalException
+
+logger = logging.getLogger(__name__)
+
+# fastapi_mail (and its templating and validation stack) is only imported
+# once the first mail goes out, most workers never send one
+if TYPE_CHECKING:
+    from fastapi_mail import ConnectionConfig, MessageSchema
+    from fastapi_mail.connection import Connection
+
+
+class OutgoingMail:
+    __slots__ = ("attempts", "message")
+
+    def __init__(self, message: "MessageSchema"):
+        self.message = message
+        self.attempts = 0
+
+
+class MailQueue:
+    # Mail is handed to a bounded in-process queue and sent by a few workers,
+    # so a request never waits for SMTP. Every worker keeps its SMTP
+    # connection open across messages and only reconnects after an error or
+    # once it has been idle for `idle_seconds`, which servers tend to drop.
+    # A failed message is retried with exponential backoff, `retries` times.
+    # With SUPPRESS_SEND set nothing reaches SMTP, but the messages are still
+    # built and dispatched to record_messages, as FastMail does.
+    def __init__(
+        self,
+        conf: "ConnectionConfig",
+        size: int,
+        workers: int,
+        batch_size: int,
+        retries: int,
+        backoff: float,
+        idle_seconds: float,
+    ):
+        from fastapi_mail import FastMail
+
+        self.conf = conf
+        self.mail = FastMail(conf)
+        self.size = size
+        self.workers_count = workers
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.idle_seconds = idle_seconds
+        self.queue: asyncio.Queue[OutgoingMail] | None = None
+        self.workers: List[asyncio.Task] = []
+        self.retrying = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connections = 0
+
+    def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.size)
+            self.workers = [
+                asyncio.create_task(self._work()) for _ in range(self.workers_count)
+            ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = None
+
+    def submit(self, message: "MessageSchema"):
+        self.start()
+        assert self.queue is not None
+        try:
+            self.queue.put_nowait(OutgoingMail(message))
+        except asyncio.QueueFull:
+            raise GlobalException(MailQueueFull(), status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def stats(self) -> MailQueueStats:
+        return MailQueueStats(
+            depth=self.queue.qsize() if self.queue is not None else 0,
+            retrying=self.retrying,
+            workers=len(self.workers),
+            sent=self.sent,
+            retried=self.retried,
+            failed=self.failed,
+            connections=self.connections,
+        )
+
+    async def _next_batch(self) -> List[OutgoingMail]:
+        assert self.queue is not None
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _connect(self) -> "Connection":
+        from fastapi_mail.connection import Connection
+
+        connection = Connection(self.conf)
+        await connection.__aenter__()
+        self.connections += 1
+        return connection
+
+    @staticmethod
+    async def _close(connection: "Connection"):
+        try:
+            await connection.__aexit__(None, None, None)
+        except Exception as ex:
+            # Already broken, the server side goes away on its own
+            logger.warning("closing the SMTP connection: %r", ex)
+
+    async def _work(self):
+        from fastapi_mail.fastmail import email_dispatched
+
+        assert self.queue is not None
+        connection: "Connection | None" = None
+        last_used = 0.0
+        try:
+            while True:
+                batch = await self._next_batch()
+                if (
+                    connection is not None
+                    and time.monotonic() - last_used > self.idle_seconds
+                ):
+                    await self._close(connection)
+                    connection = None
+                for mail in batch:
+                    try:
+                        prepared = await self.mail.get_message(mail.message)
+                        # One MessageSchema in, one message out
+                        assert not isinstance(prepared, list)
+                        if not self.conf.SUPPRESS_SEND:
+                            if connection is None:
+                                connection = await self._connect()
+                            await connection.session.send_message(prepared)
+                        email_dispatched.send(prepared)
+                        self.sent += 1
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as ex:
+                        logger.warning(
+                            "sending mail to %s failed (attempt %d): %r",
+                            mail.message.recipients,
+                            mail.attempts + 1,
+                            ex,
+                        )
+                        if connection is not None:
+                            await self._close(connection)
+                            connection = None
+                        self._retry(mail)
+                    finally:
+                        self.queue.task_done()
+                last_used = time.monotonic()
+        finally:
+            if connection is not None:
+                await self._close(connection)
+
+    def _retry(self, mail: OutgoingMail):
+        mail.attempts += 1
+        if mail.attempts > self.retries:
+            logger.warning(
+                "giving up on mail to %s after %d attempts",
+                mail.message.recipients,
+                mail.attempts,
+            )
+            self.failed += 1
+            return
+        self.retried += 1
+        self.retrying += 1
+        asyncio.get_running_loop().call_later(
+            self.backoff * 2 ** (mail.attempts - 1), self._requeue, mail
+        )
+
+    def _requeue(self, mail: OutgoingMail):
+        self.retrying -= 1
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(mail)
+        except asyncio.QueueFull:
+            logger.warning(
+                "mail queue full, dropping mail to %s", mail.message.recipients
+            )
+            self.failed += 1
+
+
+@lru_cache()
+def get_mail_queue() -> MailQueue:
+    from src.authentication.config import mail_conf
+
+    return MailQueue(
+        mail_conf,
+        size=config.MAIL_QUEUE_SIZE,
+        workers=config.MAIL_WORKERS,
+        batch_size=config.MAIL_BATCH_SIZE,
+        retries=config.MAIL_RETRIES,
+        backoff=config.MAIL_RETRY_BACKOFF_SECONDS,
+        idle_seconds=config.MAIL_IDLE_SECONDS,
+    )
@@ -6,11 +6,17 @@ from src.models import BaseModel
 
 
 class Token(BaseModel):
+    # One row per login session, `token` is the jti shared by its refresh
+    # token and the access tokens issued with it
+    __tablename__ = "token"
     id: Mapped[int] = mapped_column(
         primary_key=True, unique=True, index=True, autoincrement=True
     )
     token: Mapped[str] = mapped_column(unique=True, index=True)
+    # Whose session, so a password reset can end all of them
+    user_id: Mapped[str | None] = mapped_column(nullable=True, index=True)
+    role: Mapped[str | None] = mapped_column(nullable=True)
     force_expired: Mapped[bool] = mapped_column(default=False)
     created_at: Mapped[datetime.datetime] = mapped_column(
-        default_factory=lambda: datetime.datetime.now(tz=None)
+        default=lambda: datetime.datetime.now(tz=None)
     )
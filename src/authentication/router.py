@@ -1,44 +1,67 @@
 import datetime
-from typing import Union
+import uuid
+from typing import Tuple, Union, cast
 
+import jwt
 import sqlalchemy as sa
 from fastapi import APIRouter, HTTPException, status
-from fastapi_mail import FastMail, MessageSchema, MessageType
+from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.authentication.config import mail_conf
-from src.authentication.constants import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    LOGIN_ROUTE,
-    REGISTRATION_ROUTE,
+from src.authentication.constants import LOGIN_ROUTE, REGISTRATION_ROUTE
+from src.authentication.dependencies import (
+    BackendToken,
+    GetFullAdmin,
+    OAuthLoginData,
 )
-from src.authentication.dependencies import OAuthLoginData
 from src.authentication.exceptions import (
     InvalidEmail,
+    InvalidRefreshToken,
     InvalidResetLink,
+    MailQueueFull,
     PasswordsDoseNotMatch,
 )
+from src.authentication.mail import get_mail_queue
+from src.authentication.models import Token as TokenModel
 from src.authentication.schemas import (
     ForgotPasswordData,
+    HashingExecutorStats,
+    LoggedOut,
+    MailQueueStats,
+    PrincipalCacheStats,
+    RefreshTokenIn,
     ResetedSuccessful,
     ResetForegetPasswordData,
     ResetPasswordOut,
+    RevokedTokensStats,
     Token,
-    TokenData,
+)
+from src.authentication.service import (
+    get_hashing_executor,
+    get_principal_cache,
+    get_revoked_tokens,
 )
 from src.authentication.utils import (
-    create_access_token,
     create_reset_password_token,
+    create_tokens,
+    decode_access_token,
+    decode_refresh_token,
     decode_reset_password_token,
-    hash_password,
+    dummy_verify_async,
+    hash_password_async,
     to_async,
-    verify_pwd,
+    verify_pwd_async,
 )
 from src.config import config
-from src.dependencies import SessionMaker
+from src.cutsom_types import HashedPassword
+from src.database import transaction
+from src.dependencies import Session
 from src.exceptions import GlobalException, UnknownError
-from src.models import Admin
-from src.schemas import UserRole
+from src.instrumentation import get_query_stats
+from src.invalidation import Change, publish
+from src.schemas import SqlStats, UserRole
+from src.statements import CREDENTIALS_BY_USERNAME, SET_PASSWORD
 from src.student.exceptions import StudentDuplicate
 from src.student.models import Student
 from src.student.schemas import StudentAdded, StudentRegisterData, StudentSchema
@@ -47,47 +70,128 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post(LOGIN_ROUTE, response_model=Token)
-async def login(data: OAuthLoginData, maker: SessionMaker):
+async def login(data: OAuthLoginData, session: Session):
     if not data.username:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="username is empty")
     elif not data.password:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="password is empty")
-    async with maker.begin() as session:
-        stres = await session.execute(
-            sa.select(Student).where(Student.username == data.username)
+    async with transaction(session):
+        rows = (
+            await session.execute(CREDENTIALS_BY_USERNAME, {"username": data.username})
+        ).all()
+
+    if not rows:
+        await dummy_verify_async()
+    for row in rows:
+        # The id as text and the role's value, the columns every table of
+        # the union has
+        text_id, role_value, password, _ = cast(
+            Tuple[str, str, HashedPassword, int], tuple(row)
         )
-        adres = await session.execute(
-            sa.select(Admin).where(Admin.username == data.username)
+        valid, new_password = await verify_pwd_async(data.password, password)
+        if valid:
+            user_id, role = int(text_id), UserRole(role_value)
+            async with transaction(session):
+                if new_password is not None:
+                    # Hashed with an old scheme or cost, replace it while the
+                    # plain password is at hand
+                    await session.execute(
+                        SET_PASSWORD[role],
+                        {"user_id": text_id, "new_password": new_password},
+                    )
+                jti = await _start_session(session, user_id, role)
+            return await to_async(create_tokens, user_id, role, jti)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="username or password is wrong.",
+    )
+
+
+async def _start_session(
+    session: AsyncSession, user_id: int | str, role: UserRole
+) -> str:
+    jti = uuid.uuid4().hex
+    await session.execute(
+        sa.insert(TokenModel).values(
+            token=jti,
+            created_at=datetime.datetime.now(),
+            # The id as the tokens carry it
+            user_id=str(int(user_id)),
+            role=role,
         )
-        row = stres.scalar()
-        adrow = adres.scalar()
-        if row and await to_async(verify_pwd, data.password, row.password):
-            user_data = {
-                "user_id": row.id,
-                "role": UserRole.STUDENT,
-                "exp": (
-                    datetime.datetime.now()
-                    + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-                ).timestamp(),
-            }
-
-            return await to_async(create_access_token, TokenData(**user_data))
-        elif adrow and await to_async(verify_pwd, data.password, adrow.password):
-            user_data = {
-                "user_id": adrow.id,
-                "role": UserRole.ADMIN,
-                "exp": (
-                    datetime.datetime.now()
-                    + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-                ).timestamp(),
-            }
-
-            return await to_async(create_access_token, TokenData(**user_data))
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="username or password is wrong.",
-            )
+    )
+    return jti
+
+
+async def _end_session(session: AsyncSession, jti: str) -> bool:
+    # The conditional UPDATE makes a refresh token usable once: of two
+    # concurrent refreshes only one finds the session still alive.
+    ended = (
+        await session.execute(
+            sa.update(TokenModel)
+            .where(TokenModel.token == jti, TokenModel.force_expired.is_(False))
+            .values(force_expired=True)
+            .returning(TokenModel.id)
+        )
+    ).first()
+    if ended is None:
+        return False
+    get_revoked_tokens().revoke_on_commit(session, jti)
+    await publish(session, Change.TOKEN, jti)
+    return True
+
+
+async def _end_user_sessions(session: AsyncSession, user_id: int | str, role: UserRole):
+    ended = await session.execute(
+        sa.update(TokenModel)
+        .where(
+            TokenModel.user_id == str(int(user_id)),
+            TokenModel.role == role,
+            TokenModel.force_expired.is_(False),
+        )
+        .values(force_expired=True)
+        .returning(TokenModel.token)
+    )
+    jtis = ended.scalars().all()
+    if jtis:
+        get_revoked_tokens().revoke_on_commit(session, *jtis)
+        await publish(session, Change.TOKEN, *jtis)
+
+
+@router.post(
+    "/refresh",
+    response_model=Token,
+    responses={401: {"model": InvalidRefreshToken}},
+)
+async def refresh(data: RefreshTokenIn, session: Session):
+    # Rotates the session: the old refresh token and its access tokens are
+    # revoked and a new pair is issued
+    try:
+        token_data = await to_async(decode_refresh_token, data.refresh_token)
+    except (jwt.InvalidTokenError, ValidationError):
+        raise GlobalException(InvalidRefreshToken(), status.HTTP_401_UNAUTHORIZED)
+    assert token_data.jti is not None
+    async with transaction(session):
+        if not await _end_session(session, token_data.jti):
+            raise GlobalException(InvalidRefreshToken(), status.HTTP_401_UNAUTHORIZED)
+        jti = await _start_session(session, token_data.user_id, token_data.role)
+    return await to_async(create_tokens, token_data.user_id, token_data.role, jti)
+
+
+@router.post("/logout")
+async def logout(token: BackendToken, session: Session) -> LoggedOut:
+    try:
+        token_data = decode_access_token(token)
+    except (jwt.InvalidTokenError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if token_data.jti is not None:
+        async with transaction(session):
+            await _end_session(session, token_data.jti)
+    return LoggedOut()
 
 
 # TODO error handling
@@ -95,8 +199,8 @@ async def login(data: OAuthLoginData, maker: SessionMaker):
     REGISTRATION_ROUTE,
     responses={400: {"model": StudentDuplicate}},
 )
-async def create_user(data: StudentRegisterData, maker: SessionMaker) -> StudentAdded:
-    async with maker.begin() as session:
+async def create_user(data: StudentRegisterData, session: Session) -> StudentAdded:
+    async with transaction(session):
         # TODO request should send to admin for accept
         try:
             res = (
@@ -112,7 +216,7 @@ async def create_user(data: StudentRegisterData, maker: SessionMaker) -> Student
                             "username": data.student_id,
                             "phone_number": data.phone_number,
                             "birth_day": data.birth_day,
-                            "password": await to_async(hash_password, data.national_id),
+                            "password": await hash_password_async(data.national_id),
                         }
                     )
                     .returning(Student)
@@ -147,32 +251,37 @@ async def create_user(data: StudentRegisterData, maker: SessionMaker) -> Student
 
 
 # Not complete
-@router.post("/forgot-password", response_model=ResetedSuccessful)
-async def forget_password(data: ForgotPasswordData, maker: SessionMaker):
+@router.post(
+    "/forgot-password",
+    response_model=ResetedSuccessful,
+    responses={503: {"model": MailQueueFull}},
+)
+async def forget_password(data: ForgotPasswordData, session: Session):
+    from fastapi_mail import MessageSchema, MessageType
+
     try:
-        async with maker.begin() as session:
+        async with transaction(session):
             result = await session.execute(
-                sa.select(Student).where(Student.email == data.email)
+                sa.select(Student.email).where(Student.email == data.email)
             )
-            user = result.scalar()
-            if user is None:
-                raise GlobalException(InvalidEmail(), status.HTTP_400_BAD_REQUEST)
+            email = result.scalar()
+        if email is None:
+            raise GlobalException(InvalidEmail(), status.HTTP_400_BAD_REQUEST)
 
-            reset_token = await to_async(create_reset_password_token, data.email)
+        reset_token = await to_async(create_reset_password_token, data.email)
 
-            reset_link = f"https://{config.FRONTEND_DOMAIN}/{config.FORGOT_PASSWORD_URL}/{reset_token}"
-            html = f"<a href='{reset_link}'>Click here to reset password</a>"
+        reset_link = f"https://{config.FRONTEND_DOMAIN}/{config.FORGOT_PASSWORD_URL}/{reset_token}"
+        html = f"<a href='{reset_link}'>Click here to reset password</a>"
 
-            message = MessageSchema(
-                subject="Reset password instructions",
-                recipients=[user.email],
-                body=html,
-                subtype=MessageType.html,
-            )
-
-            fm = FastMail(mail_conf)
-            await fm.send_message(message)
-            return ResetedSuccessful(message="Email has been sent")
+        message = MessageSchema(
+            subject="Reset password instructions",
+            recipients=[email],
+            body=html,
+            subtype=MessageType.html,
+        )
+        # Sent by the mail workers, the response does not wait for SMTP
+        get_mail_queue().submit(message)
+        return ResetedSuccessful(message="Email has been sent")
     except Exception as ex:
         if isinstance(ex, GlobalException):
             raise
@@ -184,7 +293,7 @@ async def forget_password(data: ForgotPasswordData, maker: SessionMaker):
     response_model=ResetPasswordOut,
     responses={400: {"model": Union[InvalidResetLink, PasswordsDoseNotMatch]}},
 )
-async def reset_password(data: ResetForegetPasswordData, maker: SessionMaker):
+async def reset_password(data: ResetForegetPasswordData, session: Session):
     if data.secret_token is None or not data.secret_token.strip():
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -205,13 +314,48 @@ async def reset_password(data: ResetForegetPasswordData, maker: SessionMaker):
     if data.new_password != data.confirm_password:
         raise GlobalException(PasswordsDoseNotMatch(), status.HTTP_400_BAD_REQUEST)
 
-    hashed_password = await to_async(hash_password, data.new_password)
+    hashed_password = await hash_password_async(data.new_password)
 
-    async with maker.begin() as session:
-        await session.execute(
-            sa.update(Student)
-            .where(Student.email == email)
-            .values({"password": hashed_password})
-        )
+    async with transaction(session):
+        student_id = (
+            await session.execute(
+                sa.update(Student)
+                .where(Student.email == email)
+                .values({"password": hashed_password})
+                .returning(Student.id)
+            )
+        ).scalar()
+        if student_id is not None:
+            # Whoever knew the old password is logged out everywhere
+            await _end_user_sessions(session, student_id, UserRole.STUDENT)
+            get_principal_cache().invalidate_on_commit(
+                session, UserRole.STUDENT, student_id
+            )
+            await publish(session, Change.STUDENT, student_id)
 
     return ResetPasswordOut()
+
+
+@router.get("/principal-cache", tags=["ByAdmin"])
+async def principal_cache_stats(_: GetFullAdmin) -> PrincipalCacheStats:
+    return get_principal_cache().stats()
+
+
+@router.get("/revoked-tokens", tags=["ByAdmin"])
+async def revoked_tokens_stats(_: GetFullAdmin) -> RevokedTokensStats:
+    return get_revoked_tokens().stats()
+
+
+@router.get("/mail-queue", tags=["ByAdmin"])
+async def mail_queue_stats(_: GetFullAdmin) -> MailQueueStats:
+    return get_mail_queue().stats()
+
+
+@router.get("/hashing-executor", tags=["ByAdmin"])
+async def hashing_executor_stats(_: GetFullAdmin) -> HashingExecutorStats:
+    return get_hashing_executor().stats()
+
+
+@router.get("/sql-stats", tags=["ByAdmin"])
+async def sql_stats(_: GetFullAdmin) -> SqlStats:
+    return get_query_stats().stats()
@@ -11,13 +11,26 @@ class TokenData(BaseModel):
     user_id: int
     role: UserRole
     exp: TimeStamp
+    # Login session the token belongs to, revoking it revokes the token
+    jti: str | None = None
+    refresh: bool = False
 
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str | None = None
     token_type: str = "bearer"
 
 
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
+
+
+class LoggedOut(BaseModel):
+    code: Literal[SuccessCodes.LOGGED_OUT] = SuccessCodes.LOGGED_OUT
+    message: Literal["Logged out"] = "Logged out"
+
+
 class LoginData(BaseModel):
     username: str
     password: HashedPassword
@@ -40,3 +53,39 @@ class ResetPasswordOut(BaseModel):
 
 class ResetedSuccessful(BaseModel):
     message: Literal["Email has been sent"]
+
+
+class PrincipalCacheStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class RevokedTokensStats(BaseModel):
+    size: int
+    checks: int
+    rejected: int
+    loaded_at: float
+
+
+class MailQueueStats(BaseModel):
+    depth: int
+    retrying: int
+    workers: int
+    sent: int
+    retried: int
+    failed: int
+    connections: int
+
+
+class HashingExecutorStats(BaseModel):
+    kind: str
+    workers: int
+    queue_depth: int
+    max_queue: int
+    completed: int
+    rejected: int
+    latency_p50: float
+    latency_p99: float
+    latency_max: float
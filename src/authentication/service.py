@@ -0,0 +1,284 @@
+import asyncio
+import datetime
+import hashlib
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Set, Tuple, TypeVar
+
+import sqlalchemy as sa
+from fastapi import status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from src.authentication.constants import (
+    HASHING_LATENCY_BUCKETS,
+    HASHING_LATENCY_SAMPLES,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+)
+from src.authentication.exceptions import HashingBusy
+from src.authentication.models import Token
+from src.authentication.schemas import (
+    HashingExecutorStats,
+    PrincipalCacheStats,
+    RevokedTokensStats,
+    TokenData,
+)
+from src.config import config
+from src.exceptions import GlobalException
+from src.metrics import executor_metrics, get_metrics
+from src.schemas import UserRole
+
+T = TypeVar("T")
+
+
+class PrincipalCache:
+    # Authenticated users by (role, user id) so that auth dependencies can skip
+    # the SELECT of the user row. Writers of those rows must call invalidate.
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self.entries: Dict[Tuple[UserRole, str], Tuple[float, BaseModel]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, role: UserRole, user_id: int | str) -> BaseModel | None:
+        entry = self.entries.get((role, str(user_id)))
+        if entry is not None:
+            expires_at, principal = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return principal
+            del self.entries[(role, str(user_id))]
+        self.misses += 1
+        return None
+
+    def set(self, role: UserRole, user_id: int | str, principal: BaseModel):
+        if self.ttl <= 0:
+            return
+        if len(self.entries) >= self.size:
+            del self.entries[next(iter(self.entries))]
+        self.entries[(role, str(user_id))] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, role: UserRole, user_id: int | str):
+        self.entries.pop((role, str(user_id)), None)
+
+    def invalidate_on_commit(
+        self, session: AsyncSession, role: UserRole, user_id: int | str
+    ):
+        # After the commit, so a request in between can not cache the old row
+        # again
+        sa.event.listen(
+            session.sync_session,
+            "after_commit",
+            lambda _: self.invalidate(role, user_id),
+            once=True,
+        )
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> PrincipalCacheStats:
+        total = self.hits + self.misses
+        return PrincipalCacheStats(
+            size=len(self.entries),
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / total if total else 0.0,
+        )
+
+
+class TokenCache:
+    # LRU of already verified access tokens, keyed by their digest. An entry is
+    # only returned while the token's own exp is in the future, so a hit never
+    # outlives the token.
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: OrderedDict[bytes, TokenData] = OrderedDict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> TokenData | None:
+        token_data = self.entries.get(digest)
+        if token_data is None:
+            return None
+        if token_data.exp <= time.time():
+            del self.entries[digest]
+            return None
+        self.entries.move_to_end(digest)
+        return token_data
+
+    def set(self, digest: bytes, token_data: TokenData):
+        if self.size <= 0:
+            return
+        self.entries[digest] = token_data
+        self.entries.move_to_end(digest)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class RevokedTokens:
+    # The jtis of revoked login sessions, so that checking a token on every
+    # request is one set lookup instead of a query. Loaded from the token
+    # table at startup and whenever the invalidation listener reconnects,
+    # kept current in between by the revocations of this worker and the
+    # TOKEN events of the others. Sessions older than the refresh token
+    # lifetime are expired anyway and are left out of a load.
+    def __init__(self):
+        self.jtis: Set[str] = set()
+        # Revocations that arrive while a load is running
+        self.loading: Set[str] | None = None
+        self.loaded_at = 0.0
+        self.checks = 0
+        self.rejected = 0
+
+    def is_revoked(self, jti: str | None) -> bool:
+        self.checks += 1
+        if jti in self.jtis:
+            self.rejected += 1
+            return True
+        return False
+
+    def revoke(self, *jtis: str):
+        self.jtis.update(jtis)
+        if self.loading is not None:
+            self.loading.update(jtis)
+
+    def revoke_on_commit(self, session: AsyncSession, *jtis: str):
+        sa.event.listen(
+            session.sync_session,
+            "after_commit",
+            lambda _: self.revoke(*jtis),
+            once=True,
+        )
+
+    async def load(self, connection: AsyncSession | AsyncConnection):
+        since = datetime.datetime.now() - datetime.timedelta(
+            minutes=REFRESH_TOKEN_EXPIRE_MINUTES
+        )
+        self.loading = set()
+        try:
+            rows = await connection.execute(
+                sa.select(Token.token).where(
+                    Token.force_expired.is_(True), Token.created_at > since
+                )
+            )
+            # Swapped in whole, a check never sees a half loaded set
+            self.jtis = set(rows.scalars()) | self.loading
+        finally:
+            self.loading = None
+        self.loaded_at = time.time()
+
+    def stats(self) -> RevokedTokensStats:
+        return RevokedTokensStats(
+            size=len(self.jtis),
+            checks=self.checks,
+            rejected=self.rejected,
+            loaded_at=self.loaded_at,
+        )
+
+
+class HashingExecutor:
+    # bcrypt gets its own bounded pool so a login burst can neither starve the
+    # default executor (JWT work, anyio) nor pile up unbounded; once
+    # `max_queue` calls are waiting for a worker new ones fail fast with 503.
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown hashing executor {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor: Executor | None = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latencies: Deque[float] = deque(maxlen=HASHING_LATENCY_SAMPLES)
+        self.histogram = (
+            get_metrics()
+            .histogram(
+                "hashing_duration_seconds",
+                "Password hashing and verifying, queueing included",
+                ("executor",),
+                HASHING_LATENCY_BUCKETS,
+            )
+            .labels(kind)
+        )
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.kind == "process":
+                self.executor = ProcessPoolExecutor(self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="hashing"
+                )
+        return self.executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.pending - self.workers, 0)
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise GlobalException(HashingBusy(), status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.get_executor(), fn, *args
+            )
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            elapsed = time.perf_counter() - started
+            self.latencies.append(elapsed)
+            self.histogram.observe(elapsed)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> HashingExecutorStats:
+        latencies = sorted(self.latencies)
+        return HashingExecutorStats(
+            kind=self.kind,
+            workers=self.workers,
+            queue_depth=self.queue_depth,
+            max_queue=self.max_queue,
+            completed=self.completed,
+            rejected=self.rejected,
+            latency_p50=latencies[len(latencies) // 2] if latencies else 0.0,
+            latency_p99=latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+            latency_max=latencies[-1] if latencies else 0.0,
+        )
+
+
+@lru_cache()
+def get_principal_cache() -> PrincipalCache:
+    return PrincipalCache(
+        config.PRINCIPAL_CACHE_TTL_SECONDS, config.PRINCIPAL_CACHE_SIZE
+    )
+
+
+@lru_cache()
+def get_token_cache() -> TokenCache:
+    return TokenCache(config.TOKEN_CACHE_SIZE)
+
+
+@lru_cache()
+def get_revoked_tokens() -> RevokedTokens:
+    return RevokedTokens()
+
+
+@lru_cache()
+def get_hashing_executor() -> HashingExecutor:
+    executor = HashingExecutor(
+        config.HASHING_EXECUTOR, config.HASHING_WORKERS, config.HASHING_MAX_QUEUE
+    )
+    executor_metrics("hashing", lambda: executor.pending, lambda: executor.queue_depth)
+    return executor
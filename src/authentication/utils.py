@@ -1,33 +1,163 @@
 import asyncio
+import os
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING, Tuple
 
 import jwt
-from passlib.context import CryptContext
 
-from src.authentication.constants import ALGORITHM, RESET_PASSWORD_EXP_TIME
+from src.authentication.constants import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ALGORITHM,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+    RESET_PASSWORD_EXP_TIME,
+)
 from src.authentication.schemas import Token, TokenData
+from src.authentication.service import (
+    get_hashing_executor,
+    get_revoked_tokens,
+    get_token_cache,
+)
 from src.config import config
-from src.cutsom_types import HashedPassword
+from src.cutsom_types import HashedPassword, TimeStamp
+from src.metrics import executor_metrics
+from src.schemas import UserRole
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@lru_cache()
+def get_pwd_context() -> "CryptContext":
+    # passlib is imported on the first hash instead of with the app
+    from passlib.context import CryptContext
+
+    schemes = [scheme.strip() for scheme in config.PASSWORD_SCHEMES.split(",")]
+    rounds = {
+        "bcrypt": config.BCRYPT_ROUNDS,
+        "pbkdf2_sha256": config.PBKDF2_SHA256_ROUNDS,
+    }
+    # Pinning min and max to the configured cost makes every hash of another
+    # cost, cheaper or dearer, show up as needing an update.
+    options = {
+        f"{scheme}__{option}": rounds[scheme]
+        for scheme in schemes
+        if scheme in rounds
+        for option in ("default_rounds", "min_rounds", "max_rounds")
+    }
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
 
 
 def hash_password(raw_password: str) -> HashedPassword:
-    hashed = HashedPassword(pwd_context.hash(raw_password))
+    hashed = HashedPassword(get_pwd_context().hash(raw_password))
     return hashed
 
 
-def verify_pwd(plain: str, hash: HashedPassword) -> bool:
-    return pwd_context.verify(plain, hash)
+def verify_pwd(plain: str, hash: HashedPassword) -> Tuple[bool, HashedPassword | None]:
+    # Also returns the replacement hash when `hash` is of an old scheme or
+    # cost, None when it is current
+    valid, new_hash = get_pwd_context().verify_and_update(plain, hash)
+    return valid, None if new_hash is None else HashedPassword(new_hash)
+
+
+def dummy_verify() -> bool:
+    # Module level like the others, a process executor can not pickle the
+    # bound method of the CryptContext
+    return get_pwd_context().dummy_verify()
+
+
+def decode_access_token(token: str) -> TokenData:
+    # Raises jwt.InvalidTokenError (including expired and revoked tokens) or
+    # ValidationError
+    cache = get_token_cache()
+    digest = cache.digest(token)
+    token_data = cache.get(digest)
+    if token_data is None:
+        payload = jwt.decode(token, config.SECRET, algorithms=[ALGORITHM])
+        token_data = TokenData(**payload)
+        if token_data.refresh:
+            raise jwt.InvalidTokenError("refresh token used as access token")
+        cache.set(digest, token_data)
+    if get_revoked_tokens().is_revoked(token_data.jti):
+        raise jwt.InvalidTokenError("token revoked")
+    return token_data
+
+
+def decode_refresh_token(token: str) -> TokenData:
+    # Only checks the signature and exp, the token table decides whether the
+    # session is still alive
+    token_data = TokenData(**jwt.decode(token, config.SECRET, algorithms=[ALGORITHM]))
+    if not token_data.refresh or token_data.jti is None:
+        raise jwt.InvalidTokenError("not a refresh token")
+    return token_data
 
 
-def create_access_token(token_data: TokenData) -> Token:
-    encoded = jwt.encode(token_data.model_dump(), config.SECRET, ALGORITHM)
-    return Token(access_token=encoded)
+def create_tokens(user_id: int, role: UserRole, jti: str) -> Token:
+    # A short lived access token and the refresh token that renews it, both
+    # bound to the login session `jti`
+    now = datetime.now()
+    access = TokenData(
+        user_id=user_id,
+        role=role,
+        exp=TimeStamp(
+            (now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)).timestamp()
+        ),
+        jti=jti,
+    )
+    refresh = TokenData(
+        user_id=user_id,
+        role=role,
+        exp=TimeStamp(
+            (now + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)).timestamp()
+        ),
+        jti=jti,
+        refresh=True,
+    )
+    return Token(
+        access_token=jwt.encode(access.model_dump(), config.SECRET, ALGORITHM),
+        refresh_token=jwt.encode(refresh.model_dump(), config.SECRET, ALGORITHM),
+    )
+
+
+class DefaultExecutorLoad:
+    # Calls to_async has handed to the loop's default executor. The executor
+    # keeps no count of its own, this one is read by /metrics.
+    def __init__(self):
+        self.pending = 0
+        # ThreadPoolExecutor's default size
+        self.workers = min(32, (os.cpu_count() or 1) + 4)
+        executor_metrics(
+            "to_async",
+            lambda: self.pending,
+            lambda: max(self.pending - self.workers, 0),
+        )
+
+
+to_async_load = DefaultExecutorLoad()
 
 
 async def to_async(fn, *args):
-    return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+    to_async_load.pending += 1
+    try:
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+    finally:
+        to_async_load.pending -= 1
+
+
+async def hash_password_async(raw_password: str) -> HashedPassword:
+    return await get_hashing_executor().run(hash_password, raw_password)
+
+
+async def verify_pwd_async(
+    plain: str, hash: HashedPassword
+) -> Tuple[bool, HashedPassword | None]:
+    return await get_hashing_executor().run(verify_pwd, plain, hash)
+
+
+async def dummy_verify_async() -> bool:
+    # Takes as long as a real verify, so that an unknown username can not be
+    # told apart from a wrong password by the response time
+    return await get_hashing_executor().run(dummy_verify)
 
 
 def create_reset_password_token(email: str):
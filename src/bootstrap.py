@@ -0,0 +1,173 @@
+import datetime
+import importlib
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.config import config
+from src.constants import BOOTSTRAP_LOCK_ID, SCHEMA_VERSION
+from src.models import Admin, BaseModel
+from src.schemas import Readiness
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = os.environ.get("DB_NAME", config.postgres_db)
+
+# create_all and the mapper configuration only know the models imported so
+# far, and a worker serving a subset of the routers has not imported them all
+MODELS = [
+    "src.authentication.models",
+    "src.course.models",
+    "src.instructor.models",
+    "src.student.models",
+]
+# Brings a database created by an older create_all up to the models.
+# create_all only adds missing tables, so columns and indexes added to
+# existing tables since then are added here. Every statement must be safe to
+# run again.
+MIGRATIONS = [
+    "ALTER TABLE course ADD COLUMN IF NOT EXISTS capacity INTEGER",
+    (
+        "ALTER TABLE course"
+        " ADD COLUMN IF NOT EXISTS reserved_count INTEGER NOT NULL DEFAULT 0"
+    ),
+    # The column starts at 0 on existing rows, count what is already reserved
+    (
+        "UPDATE course SET reserved_count = (SELECT count(*) FROM reserved_course"
+        " WHERE reserved_course.course_id = course.id)"
+    ),
+    (
+        "CREATE INDEX IF NOT EXISTS ix_course_instructor_course_id"
+        " ON course_instructor (course_id)"
+    ),
+    "ALTER TABLE token ADD COLUMN IF NOT EXISTS user_id VARCHAR",
+    "ALTER TABLE token ADD COLUMN IF NOT EXISTS role VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_token_user_id ON token (user_id)",
+]
+
+
+class Bootstrap:
+    # Gets the database schema to SCHEMA_VERSION once per deployment instead
+    # of once per worker. A worker that finds the stored version current is
+    # done after one query; otherwise the workers queue on an advisory lock
+    # and the first one creates the tables, runs MIGRATIONS, adds the
+    # default admin and stores the version, all in one transaction, while
+    # the others find the work done once they get the lock.
+    def __init__(self):
+        self.ready = False
+        self.migrated = False
+        self.started_at = time.perf_counter()
+        self.app_seconds = 0.0
+        self.bootstrap_seconds = 0.0
+        self.cold_start_seconds = 0.0
+
+    async def run(self, engine: AsyncEngine):
+        started = time.perf_counter()
+        for module in MODELS:
+            importlib.import_module(module)
+        async with engine.connect() as conn:
+            current = await self._version(conn)
+        if current != SCHEMA_VERSION:
+            await self._create_database(engine)
+            async with engine.begin() as conn:
+                await conn.execute(
+                    sa.select(sa.func.pg_advisory_xact_lock(BOOTSTRAP_LOCK_ID))
+                )
+                if await self._version(conn) != SCHEMA_VERSION:
+                    await self._migrate(conn)
+                    self.migrated = True
+        self.bootstrap_seconds = time.perf_counter() - started
+
+    def set_ready(self, ready: bool):
+        self.ready = ready
+        if ready and not self.cold_start_seconds:
+            self.cold_start_seconds = time.perf_counter() - self.started_at
+            logger.info(
+                "ready in %.3fs (app %.3fs, bootstrap %.3fs, migrated %s)",
+                self.cold_start_seconds,
+                self.app_seconds,
+                self.bootstrap_seconds,
+                self.migrated,
+            )
+
+    def readiness(self) -> Readiness:
+        return Readiness(
+            ready=self.ready,
+            schema_version=SCHEMA_VERSION,
+            migrated=self.migrated,
+            app_seconds=self.app_seconds,
+            bootstrap_seconds=self.bootstrap_seconds,
+            cold_start_seconds=self.cold_start_seconds,
+        )
+
+    @staticmethod
+    async def _version(conn: AsyncConnection) -> int | None:
+        exists = (
+            await conn.execute(sa.select(sa.func.to_regclass("schema_version")))
+        ).scalar()
+        if exists is None:
+            return None
+        return (
+            await conn.execute(sa.text("SELECT max(version) FROM schema_version"))
+        ).scalar()
+
+    @staticmethod
+    async def _create_database(engine: AsyncEngine):
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )  # Disable transaction
+            try:
+                await conn.execute(sa.text(f"CREATE DATABASE {DB_NAME}"))
+                logger.info("database %s created", DB_NAME)
+            except Exception as e:
+                if "already exists" in str(e):
+                    logger.info("database %s already exists", DB_NAME)
+                else:
+                    logger.error("creating database %s: %s", DB_NAME, e)
+
+    @staticmethod
+    async def _migrate(conn: AsyncConnection):
+        await conn.run_sync(BaseModel.metadata.create_all)
+        for statement in MIGRATIONS:
+            await conn.execute(sa.text(statement))
+        logger.info("schema created")
+
+        # bcrypt (and passlib) only when the admin is really missing
+        has_admin = (
+            await conn.execute(sa.select(sa.exists().where(Admin.username == "admin")))
+        ).scalar()
+        if not has_admin:
+            from src.authentication.utils import hash_password_async
+
+            await conn.execute(
+                sa.insert(Admin).values(
+                    {
+                        "first_name": "admin",
+                        "last_name": "admin por",
+                        "national_id": "3490595959",
+                        "email": "admin@admin.com",
+                        "username": "admin",
+                        "phone_number": "09120000000",
+                        "birth_day": datetime.date(2020, 10, 10),
+                        "password": await hash_password_async("admin"),
+                    }
+                )
+            )
+
+        await conn.execute(
+            sa.text(
+                "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"
+            )
+        )
+        await conn.execute(sa.text("DELETE FROM schema_version"))
+        await conn.execute(
+            sa.text("INSERT INTO schema_version (version) VALUES (:version)"),
+            {"version": SCHEMA_VERSION},
+        )
+
+
+bootstrap = Bootstrap()
@@ -1,3 +1,5 @@
+import os
+
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,6 +27,66 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool
     VALIDATE_CERTS: bool
     FRONTEND_DOMAIN: str
+    RESERVATION_QUEUE_ENABLED: bool = False
+    RESERVATION_QUEUE_SIZE: int = 10_000
+    RESERVATION_QUEUE_WORKERS: int = 4
+    RESERVATION_BATCH_SIZE: int = 500
+    RESERVATION_BATCH_WAIT_MS: int = 5
+    # How long shutdown waits for the queued reservations to be written
+    RESERVATION_QUEUE_DRAIN_SECONDS: float = 10.0
+    # 0 turns the in-process free seat counters off
+    SEAT_CACHE_RECONCILE_SECONDS: int = 5
+    # 0 turns the authenticated principal cache off
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_SIZE: int = 100_000
+    # 0 turns the verified token cache off
+    TOKEN_CACHE_SIZE: int = 10_000
+    # "thread" or "process" pool that runs bcrypt off the event loop
+    HASHING_EXECUTOR: str = "thread"
+    HASHING_WORKERS: int = 4
+    # bcrypt calls allowed to wait for a worker before requests get a 503
+    HASHING_MAX_QUEUE: int = 64
+    # Accepted password hash schemes, comma separated. New hashes use the
+    # first one, hashes of the others are replaced on the next login.
+    PASSWORD_SCHEMES: str = "bcrypt"
+    # Cost of new hashes, hashes of any other cost are replaced on login too
+    BCRYPT_ROUNDS: int = 12
+    PBKDF2_SHA256_ROUNDS: int = 29_000
+    # Outbound mail queue, each worker keeps one SMTP connection open
+    MAIL_QUEUE_SIZE: int = 10_000
+    MAIL_WORKERS: int = 2
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_RETRIES: int = 5
+    # Doubles with every retry of the same message
+    MAIL_RETRY_BACKOFF_SECONDS: float = 1.0
+    # Reconnect instead of reusing a connection idle for longer than this
+    MAIL_IDLE_SECONDS: float = 30.0
+    # Processes of the pool bulk student imports hash with, apart from the
+    # hashing executor of the logins
+    STUDENT_IMPORT_WORKERS: int = os.cpu_count() or 1
+    # Share cache invalidations between workers over Postgres LISTEN/NOTIFY
+    INVALIDATION_BUS_ENABLED: bool = True
+    INVALIDATION_RETRY_SECONDS: int = 5
+    # Comma separated replica URLs that serve the GET requests, empty for none
+    DATABASE_REPLICA_URLS: str = ""
+    # How long reads of a changed student or catalog stay on the primary
+    REPLICA_STICKY_SECONDS: int = 5
+    # SQLAlchemy compiled statements per engine, see src/statements.py
+    SQL_COMPILED_CACHE_SIZE: int = 1000
+    # asyncpg prepared statements per connection, 0 turns them off
+    PREPARED_STATEMENT_CACHE_SIZE: int = 256
+    # Comma separated routers of src.app.ROUTERS this worker serves, all when
+    # empty
+    APP_ROUTERS: str = ""
+    # Per statement timings from engine events, see src/instrumentation.py
+    SQL_INSTRUMENTATION_ENABLED: bool = True
+    # Statements slower than this are logged with their text and kept
+    SQL_SLOW_QUERY_MS: float = 200.0
+    # Share of the other statements logged with their text, 0 to 1
+    SQL_SAMPLE_RATE: float = 0.0
+    LOG_LEVEL: str = "INFO"
+    # Log records waiting for the writer thread, dropped beyond this
+    LOG_QUEUE_SIZE: int = 10_000
     model_config = SettingsConfigDict(env_file=".env")
 
 
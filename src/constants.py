@@ -0,0 +1,14 @@
+# Keys kept on the primary after a change, see ReplicaRouter
+STICKY_KEYS_SIZE = 100_000
+# Bump with every change to MIGRATIONS in src/bootstrap.py
+SCHEMA_VERSION = 3
+# pg_advisory_xact_lock key the workers serialize the bootstrap on
+BOOTSTRAP_LOCK_ID = 4_190_001
+# Upper bounds of the SQL latency histogram buckets, one more bucket above
+SQL_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Distinct statements with their own histogram, see QueryStats
+SQL_STATEMENTS_SIZE = 500
+SLOW_QUERIES_SIZE = 100
+# Histogram bucket upper bounds in seconds, see src/metrics.py
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
@@ -0,0 +1,17 @@
+# Sections are fixed 2 hour blocks between 8 and 20 on every day of the week
+FIRST_SECTION_HOUR = 8
+LAST_SECTION_HOUR = 20
+SECTION_HOURS = 2
+BLOCKS_PER_DAY = (LAST_SECTION_HOUR - FIRST_SECTION_HOUR) // SECTION_HOURS
+DAYS_PER_WEEK = 7
+WEEK_SLOTS = DAYS_PER_WEEK * BLOCKS_PER_DAY
+
+# Courses per keyset page of the catalog, and per page fetched while streaming
+CATALOG_MAX_PAGE_SIZE = 500
+CATALOG_STREAM_PAGE_SIZE = 1000
+
+# Pre-serialized catalog responses kept per snapshot version (one per page)
+CATALOG_SNAPSHOT_ENTRIES = 256
+
+# Instructors whose week mask of enrolled sections is kept
+INSTRUCTOR_MASKS_SIZE = 10_000
@@ -18,6 +18,11 @@ class CourseNotFound(BaseError):
     details: Literal["Course not found."] = "Course not found."
 
 
+class CourseFull(BaseError):
+    code: Literal[ErrorCode.COURSE_FULL] = ErrorCode.COURSE_FULL
+    details: Literal["Course capacity is full."] = "Course capacity is full."
+
+
 class SectionNotFound(BaseError):
     code: Literal[ErrorCode.SECTION_NOT_FOUND] = ErrorCode.SECTION_NOT_FOUND
     details: Literal["Seciton not found."] = "Seciton not found."
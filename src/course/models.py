@@ -79,6 +79,9 @@ class Course(BaseModel):
     sections_count: Mapped[int] = mapped_column(SMALLINT)
     unit: Mapped[int] = mapped_column(SMALLINT)
     importance: Mapped[int] = mapped_column()
+    # None means the course takes any number of students
+    capacity: Mapped[int | None] = mapped_column(nullable=True, default=None)
+    reserved_count: Mapped[int] = mapped_column(default=0, server_default="0")
     # sections: Mapped[list[CourseSection]] = relationship(
     #     back_populates="courses", secondary=CourseSectionToCourseAssociation
     # )
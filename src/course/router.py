@@ -1,9 +1,11 @@
 from typing import Dict
 
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import delete, func, insert, select, update
 
 from src.authentication.dependencies import GetFullAdmin, allowed_by
+from src.course.constants import CATALOG_MAX_PAGE_SIZE
 from src.course.exceptions import (
     CourseExists,
     CourseNotFound,
@@ -22,6 +24,8 @@ from src.course.schemas import (
     AddCourseIn,
     AddSectionIn,
     AllCoursesOut,
+    CatalogCourse,
+    CatalogPage,
     CourseCreated,
     CourseDeleted,
     CourseInfoSchema,
@@ -35,13 +39,24 @@ from src.course.schemas import (
     SectionDeleted,
     Unit,
     UpdateCourseIn,
+    overlaps,
+    slot_mask,
 )
-from src.dependencies import SessionMaker
+from src.course.service import (
+    get_catalog_service,
+    get_catalog_snapshot,
+    get_section_service,
+    get_slot_masks,
+)
+from src.database import AsyncSession, get_replica_router, transaction
+from src.dependencies import Session
 from src.exceptions import GlobalException, UnknownError
 from src.instructor.exceptions import InstructorNotFound
 from src.instructor.models import CourseInstructor, Instructor
 from src.instructor.schemas import InstructorSchema
+from src.invalidation import Change, publish, sticky_key
 from src.schemas import UserRole
+from src.student.service import get_reservation_service
 
 router = APIRouter(prefix="/course", tags=["Courses"])
 
@@ -52,18 +67,12 @@ router = APIRouter(prefix="/course", tags=["Courses"])
     responses={400: {"model": SectionExists}, 201: {"model": SectionCreated}},
     tags=["ByAdmin"],
 )
-async def new_section(data: AddSectionIn, maker: SessionMaker, _: GetFullAdmin):
-    async with maker.begin() as session:
-        query = (
-            select(func.count(CourseSection.id))
-            .select_from(CourseSection)
-            .filter(CourseSection.day_of_week == data.week_day)
-            .filter(CourseSection.start_time == data.start_time)
-            .filter(CourseSection.end_time == data.end_time)
-        )
-        res = await session.execute(query)
-        c = res.scalar()
-        if c is not None and c > 0:
+async def new_section(data: AddSectionIn, session: Session, _: GetFullAdmin):
+    async with transaction(session):
+        # AddSectionIn only accepts whole blocks, so a section with the same
+        # times is one in the same slot
+        taken = await get_section_service().taken_slots(session)
+        if overlaps(taken, slot_mask(data.week_day, data.start_time)):
             raise GlobalException(SectionExists(), 400)
         insert_query = (
             insert(CourseSection)
@@ -77,6 +86,9 @@ async def new_section(data: AddSectionIn, maker: SessionMaker, _: GetFullAdmin):
             .returning(CourseSection.id)
         )
         insert_res = (await session.execute(insert_query)).scalar()
+        get_slot_masks().clear_on_commit(session)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.CATALOG)
         if insert_res is not None:
             return SectionCreated(section_id=insert_res)
 
@@ -87,8 +99,8 @@ async def new_section(data: AddSectionIn, maker: SessionMaker, _: GetFullAdmin):
     tags=["ByAdmin"],
     responses={400: {"model": SectionNotFound}},
 )
-async def delete_section(_: GetFullAdmin, maker: SessionMaker, data: DeleteSectionIn):
-    async with maker.begin() as session:
+async def delete_section(_: GetFullAdmin, session: Session, data: DeleteSectionIn):
+    async with transaction(session):
         section = await session.execute(
             select(CourseSection).where(CourseSection.id == data.section_id)
         )
@@ -109,21 +121,41 @@ async def delete_section(_: GetFullAdmin, maker: SessionMaker, data: DeleteSecti
         await session.execute(query1)
         await session.execute(query2)
         await session.execute(query)
+        get_slot_masks().clear_on_commit(session)
+        get_reservation_service().clear_on_commit(session)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.CATALOG)
 
         return SectionDeleted(section=CourseSectionSchema.model_validate(check_section))
 
 
+def _route_snapshot_build(session: AsyncSession):
+    # A snapshot is cached until the next change, so one built from a replica
+    # that has not caught up with a change yet would be served for good.
+    get_replica_router().route(
+        session, sticky_key(Change.CATALOG), sticky_key(Change.INSTRUCTOR)
+    )
+
+
 # TODO Error Handeling
 @router.get(
     "/all", status_code=status.HTTP_200_OK, responses={200: {"model": AllCoursesOut}}
 )
 async def get_all_courses(
-    maker: SessionMaker,
+    request: Request,
+    session: Session,
     _: UserRole = allowed_by(UserRole.ALL),
     limit: int = Query(gt=0, default=10, lt=25),
     offset: int = Query(gt=-1, default=0),
 ):
-    async with maker.begin() as session:
+    return await get_catalog_snapshot().respond(
+        request, ("all", limit, offset), lambda: _all_courses(session, limit, offset)
+    )
+
+
+async def _all_courses(session: AsyncSession, limit: int, offset: int) -> AllCoursesOut:
+    _route_snapshot_build(session)
+    async with transaction(session):
         query = (
             select(Course, Instructor, CourseSection)
             .select_from(Course)
@@ -170,6 +202,7 @@ async def get_all_courses(
                     sections_count=CourseSectionCount(c.sections_count),
                     unit=Unit(c.unit),
                     importance=c.importance,
+                    capacity=c.capacity,
                     sections=sections_obj,
                     instructor=InstructorSchema.model_validate(instructor),
                 )
@@ -177,12 +210,47 @@ async def get_all_courses(
         return AllCoursesOut(courses=courses, count=len(courses))
 
 
+@router.get("/catalog")
+async def catalog(
+    session: Session,
+    _: UserRole = allowed_by(UserRole.ALL),
+    after: int = Query(ge=0, default=0),
+    limit: int = Query(gt=0, default=50, le=CATALOG_MAX_PAGE_SIZE),
+) -> CatalogPage:
+    async with transaction(session):
+        page = await get_catalog_service().get_page(session, after, limit)
+    courses = [CatalogCourse.model_validate_json(document) for _, document in page]
+    return CatalogPage(
+        courses=courses,
+        count=len(courses),
+        next_cursor=page[-1][0] if len(page) == limit else None,
+    )
+
+
+@router.get("/catalog/stream", response_class=StreamingResponse)
+async def catalog_stream(_: UserRole = allowed_by(UserRole.ALL)):
+    # The whole catalog as NDJSON, one CatalogCourse per line
+    async def lines():
+        async for document in get_catalog_service().stream():
+            yield document + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/all-sections")
 async def all_sections(
-    maker: SessionMaker,
+    request: Request,
+    session: Session,
     _: UserRole = allowed_by([UserRole.ADMIN, UserRole.INSTRUCTOR]),
 ) -> ListSections:
-    async with maker.begin() as session:
+    return await get_catalog_snapshot().respond(  # type: ignore
+        request, "all-sections", lambda: _all_sections(session)
+    )
+
+
+async def _all_sections(session: AsyncSession) -> ListSections:
+    _route_snapshot_build(session)
+    async with transaction(session):
         sections = (await session.execute(select(CourseSection))).scalars().all()
         objs = [CourseSectionSchema.model_validate(sec) for sec in sections]
         return ListSections(sections=objs, count=len(objs))
@@ -195,9 +263,9 @@ async def all_sections(
     tags=["ByAdmin"],
 )
 async def new_course(
-    data: AddCourseIn, maker: SessionMaker, _: GetFullAdmin
+    data: AddCourseIn, session: Session, _: GetFullAdmin
 ) -> CourseCreated:
-    async with maker.begin() as session:
+    async with transaction(session):
         if data.section_count < 1:
             raise GlobalException(SectionCountValue(), status.HTTP_400_BAD_REQUEST)
 
@@ -240,6 +308,7 @@ async def new_course(
                     "sections_count": data.section_count,
                     "unit": data.unit,
                     "importance": data.importance,
+                    "capacity": data.capacity,
                 }
             )
             .returning(Course.id)
@@ -250,6 +319,8 @@ async def new_course(
             {"instructor_id": data.instructor_id, "course_id": course_id}
         )
         await session.execute(insert_course_instructor_query)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.CATALOG)
 
         if insert_res is not None:
             sections = [
@@ -271,9 +342,9 @@ async def new_course(
     responses={400: {"model": CourseNotFound}},
 )
 async def delete_course(
-    _: GetFullAdmin, maker: SessionMaker, data: DeleteCourse
+    _: GetFullAdmin, session: Session, data: DeleteCourse
 ) -> CourseDeleted:
-    async with maker.begin() as session:
+    async with transaction(session):
         check_course = (
             await session.execute(select(Course).where(Course.id == data.course_id))
         ).scalar()
@@ -283,15 +354,18 @@ async def delete_course(
         query = delete(Course).where(Course.id == data.course_id)
 
         await session.execute(query)
+        get_reservation_service().clear_on_commit(session)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.CATALOG)
 
         return CourseDeleted(course=CourseInfoSchema.model_validate(check_course))
 
 
 @router.put("/update-course/{course_id}")
 async def update_course(
-    _: GetFullAdmin, data: UpdateCourseIn, maker: SessionMaker, course_id
+    _: GetFullAdmin, data: UpdateCourseIn, session: Session, course_id
 ):
-    async with maker.begin() as session:
+    async with transaction(session):
         check_course = await session.execute(
             select(Course).where(Course.id == int(course_id))
         )
@@ -316,6 +390,9 @@ async def update_course(
         query = update(Course).where(Course.id == int(course_id)).values(**UpdateData)
 
         await session.execute(query)
+        get_reservation_service().clear_on_commit(session)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.CATALOG)
 
         return {
             "message": "Course updated successfully",
@@ -1,12 +1,25 @@
 import datetime
 from enum import IntEnum
-from typing import List, Literal, NewType, Optional
+from typing import Iterable, Iterator, List, Literal, NewType, Optional, Tuple
 
 from pydantic import BaseModel, Field, ValidationInfo, field_validator
 
+from src.course.constants import (
+    BLOCKS_PER_DAY,
+    FIRST_SECTION_HOUR,
+    LAST_SECTION_HOUR,
+    SECTION_HOURS,
+    WEEK_SLOTS,
+)
 from src.schemas import Messages, ObjectAdded, ObjectDeleted, SuccessCodes
 
 CourseSectionTime = NewType("CourseSectionTime", int)
+# One bit per (day, 2 hour block): bit = day * BLOCKS_PER_DAY + block
+WeekMask = NewType("WeekMask", int)
+
+EMPTY_WEEK = WeekMask(0)
+FULL_WEEK = WeekMask((1 << WEEK_SLOTS) - 1)
+FULL_DAY = (1 << BLOCKS_PER_DAY) - 1
 
 
 class DayOfWeek(IntEnum):
@@ -30,16 +43,67 @@ class Unit(IntEnum):
     three = 3
 
 
+def section_slot(day_of_week: int, start_time: int) -> int:
+    return (
+        int(day_of_week) * BLOCKS_PER_DAY
+        + (start_time - FIRST_SECTION_HOUR) // SECTION_HOURS
+    )
+
+
+def slot_mask(day_of_week: int, start_time: int) -> WeekMask:
+    return WeekMask(1 << section_slot(day_of_week, start_time))
+
+
+def slot_time(slot: int) -> Tuple[DayOfWeek, int, int]:
+    day, block = divmod(slot, BLOCKS_PER_DAY)
+    start = FIRST_SECTION_HOUR + block * SECTION_HOURS
+    return DayOfWeek(day), start, start + SECTION_HOURS
+
+
+def iter_slots(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def overlaps(first: int, second: int) -> bool:
+    return first & second != 0
+
+
+def union(*masks: int) -> WeekMask:
+    result = 0
+    for mask in masks:
+        result |= mask
+    return WeekMask(result)
+
+
+def free_slots(mask: int) -> WeekMask:
+    return WeekMask(FULL_WEEK & ~mask)
+
+
+def day_slots(mask: int, day_of_week: int) -> int:
+    return (mask >> (int(day_of_week) * BLOCKS_PER_DAY)) & FULL_DAY
+
+
 class CourseSectionSchema(BaseModel):
     id: int
     day_of_week: DayOfWeek
     start_time: CourseSectionTime
     end_time: CourseSectionTime
 
+    @property
+    def mask(self) -> WeekMask:
+        return slot_mask(self.day_of_week, self.start_time)
+
     class Config:
         from_attributes = True
 
 
+def week_mask(sections: Iterable[CourseSectionSchema]) -> WeekMask:
+    return union(*(section.mask for section in sections))
+
+
 from src.instructor.schemas import InstructorSchema
 
 
@@ -51,6 +115,7 @@ class CourseSchema(BaseModel):
     sections_count: CourseSectionCount
     unit: Unit
     importance: int
+    capacity: Optional[int] = None
     sections: list[CourseSectionSchema]
 
     class Config:
@@ -63,6 +128,7 @@ class CourseInfoSchema(BaseModel):
     sections_count: CourseSectionCount
     unit: Unit
     importance: int
+    capacity: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -77,6 +143,7 @@ class AddCourseIn(BaseModel):
     group: int
     importance: int
     sections_id: list[int]
+    capacity: Optional[int] = Field(default=None, gt=0)
 
 
 class ReserveCourseIn(BaseModel):
@@ -114,16 +181,18 @@ class AddSectionIn(BaseModel):
 
     @field_validator("start_time")
     def st(cls, v: int, info: ValidationInfo) -> int:
-        if v < 8 or v > 20:
+        if v < FIRST_SECTION_HOUR or v > LAST_SECTION_HOUR - SECTION_HOURS:
             raise ValueError("invalid time")
+        if (v - FIRST_SECTION_HOUR) % SECTION_HOURS != 0:
+            raise ValueError("section should start at the beginning of a block")
 
         return v
 
     @field_validator("end_time")
     def et(cls, v: int, info: ValidationInfo) -> int:
-        if v < 8 or v > 20:
+        if v < FIRST_SECTION_HOUR or v > LAST_SECTION_HOUR:
             raise ValueError("invalid time")
-        if abs(v - info.data["start_time"]) != 2:
+        if v - info.data.get("start_time", v) != SECTION_HOURS:
             raise ValueError("delta times should be 2")
         return v
 
@@ -151,6 +220,18 @@ class AllCoursesOut(BaseModel):
     count: int
 
 
+class CatalogCourse(CourseSchema):
+    # Courses nobody teaches yet are part of the catalog too
+    instructor: Optional[InstructorSchema] = None  # type: ignore
+
+
+class CatalogPage(BaseModel):
+    courses: list[CatalogCourse]
+    count: int
+    # Pass as `after` to get the next page, None on the last page
+    next_cursor: Optional[int] = None
+
+
 class CourseDeleted(ObjectDeleted):
     code: Literal[SuccessCodes.COURSE_DELETED] = SuccessCodes.COURSE_DELETED
     message: Literal[Messages.COURSE_DELETED] = Messages.COURSE_DELETED
@@ -179,3 +260,4 @@ class UpdateCourseIn(BaseModel):
     importance: Optional[int] = None
     group: Optional[int] = None
     is_active: Optional[bool] = None
+    capacity: Optional[int] = Field(default=None, gt=0)
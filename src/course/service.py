@@ -1,9 +1,20 @@
+import hashlib
 from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple
 
 import sqlalchemy as sa
+from fastapi import Request, Response, status
+from pydantic import BaseModel
 
+from src.course.constants import (
+    CATALOG_SNAPSHOT_ENTRIES,
+    CATALOG_STREAM_PAGE_SIZE,
+    INSTRUCTOR_MASKS_SIZE,
+)
 from src.course.models import CourseSection
+from src.course.schemas import WeekMask, slot_mask, union
 from src.database import AsyncSession, async_sessionmaker, get_session_maker
+from src.statements import CATALOG_PAGE
 
 
 class SectionService:
@@ -32,7 +43,162 @@ class SectionService:
         ).scalar()
         return section
 
+    async def taken_slots(self, session: AsyncSession) -> WeekMask:
+        # The week grid slots that already have a section
+        masks = get_slot_masks()
+        if masks.taken is not None:
+            return masks.taken
+        version = masks.version
+        rows = await session.execute(
+            sa.select(CourseSection.day_of_week, CourseSection.start_time).distinct()
+        )
+        taken = union(*(slot_mask(day, start) for day, start in rows))
+        masks.set_taken(version, taken)
+        return taken
+
+
+class SlotMasks:
+    # The week masks the section conflict checks are answered from: the
+    # slots that have a section, and per instructor the slots of their
+    # sections. Changes drop them once they commit; a mask loaded while a
+    # change committed is still returned, but not kept.
+    def __init__(self, size: int):
+        self.size = size
+        self.version = 0
+        self.taken: WeekMask | None = None
+        self.instructors: Dict[int, WeekMask] = {}
+
+    def set_taken(self, version: int, mask: WeekMask):
+        if version == self.version:
+            self.taken = mask
+
+    def set_instructor(self, version: int, instructor_id: int, mask: WeekMask):
+        if version == self.version:
+            if len(self.instructors) >= self.size:
+                del self.instructors[next(iter(self.instructors))]
+            self.instructors[instructor_id] = mask
+
+    def clear(self):
+        self.version += 1
+        self.taken = None
+        self.instructors.clear()
+
+    def invalidate_instructor(self, instructor_id: int):
+        self.version += 1
+        self.instructors.pop(instructor_id, None)
+
+    def clear_on_commit(self, session: AsyncSession):
+        sa.event.listen(
+            session.sync_session, "after_commit", lambda _: self.clear(), once=True
+        )
+
+    def invalidate_instructor_on_commit(
+        self, session: AsyncSession, instructor_id: int
+    ):
+        sa.event.listen(
+            session.sync_session,
+            "after_commit",
+            lambda _: self.invalidate_instructor(instructor_id),
+            once=True,
+        )
+
+
+class CatalogService:
+    # Keyset pagination over course.id: a page starts right after the last id
+    # of the previous one, so deep pages cost the same as the first and a
+    # course is never split across pages.
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+        self.session_maker = session_maker
+
+    async def get_page(
+        self, session: AsyncSession, after: int, limit: int
+    ) -> List[Tuple[int, str]]:
+        rows = await session.execute(CATALOG_PAGE, {"after": after, "limit": limit})
+        return [(course_id, document) for course_id, document in rows]
+
+    async def stream(self) -> AsyncIterator[str]:
+        # One short transaction per page instead of a cursor held open for
+        # the whole export; memory stays at one page.
+        after = 0
+        while True:
+            async with self.session_maker.begin() as session:
+                page = await self.get_page(session, after, CATALOG_STREAM_PAGE_SIZE)
+            for _, document in page:
+                yield document
+            if len(page) < CATALOG_STREAM_PAGE_SIZE:
+                return
+            after = page[-1][0]
+
+
+class CatalogSnapshot:
+    # Serialized catalog responses of the current version. Every committed
+    # change to courses, sections or their instructors bumps the version and
+    # drops them; until then a request is answered from bytes, or with 304
+    # when the client already holds the same ETag.
+    def __init__(self, size: int):
+        self.size = size
+        self.version = 0
+        self.entries: Dict[Hashable, Tuple[str, bytes]] = {}
+
+    def bump(self):
+        self.version += 1
+        self.entries.clear()
+
+    def bump_on_commit(self, session: AsyncSession):
+        # After the commit, so a rebuild never reads the rows being replaced
+        sa.event.listen(
+            session.sync_session, "after_commit", lambda _: self.bump(), once=True
+        )
+
+    async def get(
+        self, key: Hashable, build: Callable[[], Awaitable[BaseModel]]
+    ) -> Tuple[str, bytes]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+        version = self.version
+        body = (await build()).model_dump_json().encode()
+        entry = (f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body)
+        # A change committed while building makes this result stale
+        if version == self.version:
+            if len(self.entries) >= self.size:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = entry
+        return entry
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        build: Callable[[], Awaitable[BaseModel]],
+    ) -> Response:
+        etag, body = await self.get(key, build)
+        headers = {"ETag": etag}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and (
+            if_none_match.strip() == "*"
+            or etag
+            in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+        ):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
 
 @lru_cache()
 def get_section_service() -> SectionService:
     return SectionService(get_session_maker())
+
+
+@lru_cache()
+def get_slot_masks() -> SlotMasks:
+    return SlotMasks(INSTRUCTOR_MASKS_SIZE)
+
+
+@lru_cache()
+def get_catalog_service() -> CatalogService:
+    return CatalogService(get_session_maker())
+
+
+@lru_cache()
+def get_catalog_snapshot() -> CatalogSnapshot:
+    return CatalogSnapshot(CATALOG_SNAPSHOT_ENTRIES)
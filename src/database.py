@@ -1,27 +1,124 @@
-import asyncio
-import datetime
 import os
-from functools import lru_cache
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache, partial
+from typing import AsyncIterator, Callable, Dict, List, Tuple, cast
 
 import sqlalchemy
-import sqlalchemy.exc
-from sqlalchemy import insert, text
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from src.authentication.utils import hash_password, to_async
 from src.config import config
-from src.models import Admin, BaseModel
+from src.constants import POOL_WAIT_BUCKETS, STICKY_KEYS_SIZE
+from src.instrumentation import get_query_stats
+from src.metrics import get_metrics
 
 URI = os.environ.get(
     "DATABASE_URL"
 )  # For Docker (Connection to databse in docker is different with local system)
-DB_NAME = os.environ.get("DB_NAME", config.postgres_db)
 if URI is None:
     URI = f"postgresql+asyncpg://{config.postgres_user}:{config.postgres_password}@{config.postgres_host}:{config.postgres_port}/{config.postgres_db}"
 
 
-engine = create_async_engine(URI, pool_size=20, max_overflow=80, echo=True)
+POOL_WAIT = get_metrics().histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time a checkout waited for a pooled connection",
+    ("engine",),
+    POOL_WAIT_BUCKETS,
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Times how long a checkout waits for a connection, which is where an
+    # exhausted pool (all of pool_size and max_overflow in use) shows up
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kw):
+        super().__init__(creator, pool_size, max_overflow, **kw)
+        self.name = ""
+        # QueuePool only keeps it privately
+        self.max_overflow = max_overflow
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.labels(self.name).observe(time.perf_counter() - started)
+
+    def recreate(self) -> "TimedQueuePool":
+        pool = cast(TimedQueuePool, super().recreate())
+        pool.name = self.name
+        return pool
+
+
+def _pool(engine: AsyncEngine) -> TimedQueuePool:
+    # Every engine of _create_engine is given this pool class
+    return cast(TimedQueuePool, engine.sync_engine.pool)
+
+
+def _pool_metrics(name: str, engine: AsyncEngine):
+    # The pool is looked up on every scrape, dispose() replaces it
+    metrics = get_metrics()
+    gauges: List[Tuple[str, str, Callable[[TimedQueuePool], int]]] = [
+        ("db_pool_size", "Connections the pool keeps open", lambda pool: pool.size()),
+        (
+            "db_pool_max_overflow",
+            "Connections the pool may open above its size",
+            lambda pool: pool.max_overflow,
+        ),
+        (
+            "db_pool_checked_out",
+            "Connections in use",
+            lambda pool: pool.checkedout(),
+        ),
+        (
+            "db_pool_overflow",
+            (
+                "Connections open above the pool size, negative while the pool"
+                " has not opened all of them"
+            ),
+            lambda pool: pool.overflow(),
+        ),
+    ]
+    for metric, help, read in gauges:
+        metrics.gauge(metric, help, ("engine",)).add(
+            (name,), partial(_read_pool, read, engine)
+        )
+
+
+def _read_pool(read: Callable[[TimedQueuePool], int], engine: AsyncEngine) -> int:
+    return read(_pool(engine))
+
+
+def _create_engine(uri: str, name: str) -> AsyncEngine:
+    url = make_url(uri).update_query_dict(
+        {"prepared_statement_cache_size": str(config.PREPARED_STATEMENT_CACHE_SIZE)}
+    )
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=20,
+        max_overflow=80,
+        query_cache_size=config.SQL_COMPILED_CACHE_SIZE,
+    )
+    _pool(engine).name = name
+    _pool_metrics(name, engine)
+    if config.SQL_INSTRUMENTATION_ENABLED:
+        get_query_stats().instrument(engine.sync_engine)
+    return engine
+
+
+engine = _create_engine(URI, "primary")
+# Same pool, but requests that only read run without BEGIN/COMMIT round trips
+read_only_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+replica_engines = [
+    _create_engine(url, f"replica{i}").execution_options(isolation_level="AUTOCOMMIT")
+    for i, url in enumerate(
+        url.strip() for url in config.DATABASE_REPLICA_URLS.split(",") if url.strip()
+    )
+]
 
 
 @lru_cache()
@@ -29,41 +126,91 @@ def get_session_maker() -> async_sessionmaker[AsyncSession]:
     return async_sessionmaker(engine)
 
 
-async def main_run():
-    async with engine.connect() as conn:
-        conn = await conn.execution_options(
-            isolation_level="AUTOCOMMIT"
-        )  # Disable transaction
-        try:
-            await conn.execute(text(f"CREATE DATABASE {DB_NAME}"))
-            print(f"Database '{DB_NAME}' created.")
-        except Exception as e:
-            if "already exists" in str(e):
-                print(f"Database '{DB_NAME}' already exists.")
-            else:
-                print(f"Error: {e}")
-
-    async with engine.begin() as conn:
-        await conn.run_sync(BaseModel.metadata.create_all)
-        print("DATABASE Created")
-    async with engine.begin() as conn:
-        try:
-            await conn.execute(
-                insert(Admin).values(
-                    {
-                        "first_name": "admin",
-                        "last_name": "admin por",
-                        "national_id": "3490595959",
-                        "email": "admin@admin.com",
-                        "username": "admin",
-                        "phone_number": "09120000000",
-                        "birth_day": datetime.date(2020, 10, 10),
-                        "password": await to_async(hash_password, "admin"),
-                    }
-                )
-            )
-        except sqlalchemy.exc.IntegrityError:
-            pass
-
-
-asyncio.create_task(main_run())
+class RoutingSession(Session):
+    # Sends the plain SELECTs of a read only request to the replica picked
+    # for it and everything else, or everything once the request is pinned,
+    # to the primary.
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if (
+            replica is None
+            or self.info.get("primary")
+            or self._flushing
+            or not isinstance(clause, sqlalchemy.Select)
+            or clause._for_update_arg is not None
+        ):
+            return super().get_bind(mapper, clause=clause, **kw)
+        return replica.sync_engine
+
+
+class ReplicaRouter:
+    # Spreads read only requests over the replicas. A replica lags behind
+    # the primary, so for `sticky_seconds` after a change to a key (a
+    # student, the catalog) the requests reading that key stay on the
+    # primary and never see, or cache, the state from before it.
+    def __init__(self, replicas: List[AsyncEngine], sticky_seconds: float):
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.next = 0
+        # key -> monotonic deadline, in deadline order
+        self.sticky: Dict[str, float] = {}
+        self.routed = 0
+        self.pinned = 0
+
+    def session(self, maker: async_sessionmaker[AsyncSession]) -> AsyncSession:
+        if not self.replicas:
+            return maker(bind=read_only_engine)
+        replica = self.replicas[self.next % len(self.replicas)]
+        self.next += 1
+        self.routed += 1
+        session = maker(bind=read_only_engine, sync_session_class=RoutingSession)
+        session.info["replica"] = replica
+        return session
+
+    def stick(self, *keys: str):
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        now = time.monotonic()
+        while self.sticky and (
+            len(self.sticky) >= STICKY_KEYS_SIZE
+            or next(iter(self.sticky.values())) <= now
+        ):
+            del self.sticky[next(iter(self.sticky))]
+        for key in keys:
+            self.sticky.pop(key, None)
+            self.sticky[key] = now + self.sticky_seconds
+
+    def stick_on_commit(self, session: AsyncSession, *keys: str):
+        sqlalchemy.event.listen(
+            session.sync_session,
+            "after_commit",
+            lambda _: self.stick(*keys),
+            once=True,
+        )
+
+    def route(self, session: AsyncSession, *keys: str):
+        # Must run before the first query of the request
+        if "replica" not in session.info or session.info.get("primary"):
+            return
+        now = time.monotonic()
+        if any(self.sticky.get(key, 0.0) > now for key in keys):
+            session.info["primary"] = True
+            self.pinned += 1
+
+
+@lru_cache()
+def get_replica_router() -> ReplicaRouter:
+    return ReplicaRouter(replica_engines, config.REPLICA_STICKY_SECONDS)
+
+
+@asynccontextmanager
+async def transaction(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    # Like session.begin(), but also continues a transaction that an earlier
+    # query of the same request (an auth dependency) has already started.
+    try:
+        yield session
+    except BaseException:
+        await session.rollback()
+        raise
+    else:
+        await session.commit()
@@ -1,8 +1,35 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio.session import AsyncSession, async_sessionmaker
 
-from src.database import get_session_maker
+from src.database import get_replica_router, get_session_maker
 
 SessionMaker = Annotated[async_sessionmaker[AsyncSession], Depends(get_session_maker)]
+
+READ_ONLY_METHODS = ("GET", "HEAD")
+
+
+async def get_session(
+    request: Request, maker: SessionMaker
+) -> AsyncIterator[AsyncSession]:
+    # One session per request, shared by the auth dependencies, services and
+    # the handler. It checks a connection out of the pool on its first query
+    # only, so a request answered from caches never touches the pool, and
+    # keeps it until the end of the handler. GET requests only read, they run
+    # on the autocommit engine and on a replica when there are any.
+    if request.method in READ_ONLY_METHODS:
+        session = get_replica_router().session(maker)
+    else:
+        session = maker()
+    async with session:
+        try:
+            yield session
+        except BaseException:
+            await session.rollback()
+            raise
+        else:
+            await session.commit()
+
+
+Session = Annotated[AsyncSession, Depends(get_session, scope="function")]
@@ -3,26 +3,24 @@ from typing import Annotated
 
 import jwt
 import pydantic
-import sqlalchemy as sa
 from fastapi import Depends, HTTPException, status
 
-from src import config
-from src.authentication.constants import ALGORITHM
 from src.authentication.dependencies import BackendToken
-from src.authentication.schemas import TokenData
-from src.dependencies import SessionMaker
-from src.instructor.models import Instructor
+from src.authentication.service import get_principal_cache
+from src.authentication.utils import decode_access_token
+from src.database import get_replica_router
+from src.dependencies import Session
 from src.instructor.schemas import InstructorSchema
+from src.invalidation import Change, sticky_key
 from src.schemas import UserRole
+from src.statements import INSTRUCTOR_BY_ID
 
 
 async def get_current_instructor(
-    maker: SessionMaker, token: BackendToken
+    session: Session, token: BackendToken
 ) -> InstructorSchema:
     try:
-        algs = [ALGORITHM]
-        payload = jwt.decode(token, config.config.SECRET, algorithms=algs)
-        token_data = TokenData(**payload)
+        token_data = decode_access_token(token)
         if token_data.role != UserRole.INSTRUCTOR:
             raise jwt.InvalidTokenError()
 
@@ -38,19 +36,27 @@ async def get_current_instructor(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    async with maker.begin() as session:
-        result = await session.execute(
-            sa.select(Instructor).where(Instructor.id == token_data.user_id)
+    # Right after their own change their reads go to the primary, the
+    # handler's too when the principal itself comes from the cache
+    get_replica_router().route(
+        session, sticky_key(Change.INSTRUCTOR, token_data.user_id)
+    )
+    cache = get_principal_cache()
+    cached = cache.get(UserRole.INSTRUCTOR, token_data.user_id)
+    if isinstance(cached, InstructorSchema):
+        return cached
+    result = await session.execute(INSTRUCTOR_BY_ID, {"user_id": token_data.user_id})
+    user = result.scalar_one_or_none()
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Could not find user",
         )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Could not find user",
-            )
 
-        return InstructorSchema.model_validate(user)
+    instructor = InstructorSchema.model_validate(user)
+    cache.set(UserRole.INSTRUCTOR, token_data.user_id, instructor)
+    return instructor
 
 
 GetFullInstructor = Annotated[InstructorSchema, Depends(get_current_instructor)]
@@ -14,8 +14,9 @@ class CourseInstructor(BaseModel):
     instructor_id: Mapped[int] = mapped_column(
         ForeignKey("instructor.id", ondelete="CASCADE"), primary_key=True
     )
+    # Indexed on its own for the per-course instructor lookup of the catalog
     course_id: Mapped[int] = mapped_column(
-        ForeignKey("course.id", ondelete="CASCADE"), primary_key=True
+        ForeignKey("course.id", ondelete="CASCADE"), primary_key=True, index=True
     )
 
 
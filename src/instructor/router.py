@@ -1,16 +1,21 @@
-from typing import Dict
+from typing import List, Optional, get_args
 
 from fastapi import APIRouter, HTTPException, Query, status
-from pydantic import ValidationError
 from sqlalchemy import delete, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.authentication.dependencies import GetFullAdmin, allowed_by
-from src.authentication.utils import hash_password, to_async
+from src.authentication.service import get_principal_cache
+from src.authentication.utils import hash_password_async
 from src.course.models import CourseSection, CourseSectionToInstructorAssociation
-from src.course.schemas import CourseSectionSchema
-from src.course.service import get_section_service
-from src.dependencies import SessionMaker
+from src.course.schemas import CourseSectionSchema, DayOfWeek
+from src.course.service import (
+    get_catalog_snapshot,
+    get_section_service,
+    get_slot_masks,
+)
+from src.database import transaction
+from src.dependencies import Session
 from src.exceptions import GlobalException
 from src.instructor.exceptions import InstructorNotFound
 from src.instructor.models import Instructor
@@ -20,12 +25,14 @@ from src.instructor.schemas import (
     EnrollSectionIn,
     InstructorCreated,
     InstructorDeleted,
+    InstructorField,
     InstructorListResponse,
     InstructorSchema,
     SectionEnrolled,
     UpdateInstructorIn,
 )
 from src.instructor.service import get_instructor_service
+from src.invalidation import Change, publish
 from src.schemas import UserRole
 
 router = APIRouter(prefix="/instructors", tags=["Instructor"])
@@ -38,62 +45,55 @@ router = APIRouter(prefix="/instructors", tags=["Instructor"])
     tags=["ByAdmin"],
     responses={201: {"model": InstructorCreated}},
 )
-async def new_instructor(data: AddInstructorIn, maker: SessionMaker, _: GetFullAdmin):
-    async with maker.begin() as session:
-        try:
-            insert_ins_query = (
-                insert(Instructor)
-                .values(
-                    {
-                        "first_name": data.first_name,
-                        "last_name": data.last_name,
-                        "national_id": data.national_id,
-                        "email": data.email,
-                        "username": data.email,
-                        "phone_number": data.phone_number,
-                        "birth_day": data.birth_day,
-                        "password": await to_async(hash_password, data.national_id),
-                    }
-                )
-                .returning(Instructor)
+async def new_instructor(data: AddInstructorIn, session: Session, _: GetFullAdmin):
+    async with transaction(session):
+        insert_ins_query = (
+            insert(Instructor)
+            .values(
+                {
+                    "first_name": data.first_name,
+                    "last_name": data.last_name,
+                    "national_id": data.national_id,
+                    "email": data.email,
+                    "username": data.email,
+                    "phone_number": data.phone_number,
+                    "birth_day": data.birth_day,
+                    "password": await hash_password_async(data.national_id),
+                }
             )
-            insert_ins_res = (await session.execute(insert_ins_query)).scalar()
-            sections = []
-            if insert_ins_res is not None:
-                if (
-                    data.available_sections is not None
-                    and len(data.available_sections) > 0
-                ):
-                    insert_sections_query = insert(
-                        CourseSectionToInstructorAssociation
-                    ).values(
-                        [
-                            {
-                                "instructor_id": insert_ins_res.id,
-                                "course_section_id": csid,
-                            }
-                            for csid in data.available_sections
-                        ]
-                    )
-                    await session.execute(insert_sections_query)
-                    sections = (
-                        await session.execute(
-                            select(CourseSection).filter(
-                                CourseSection.id.in_(data.available_sections)
-                            )
+            .returning(Instructor)
+        )
+        insert_ins_res = (await session.execute(insert_ins_query)).scalar()
+        sections = []
+        if insert_ins_res is not None:
+            if data.available_sections is not None and len(data.available_sections) > 0:
+                insert_sections_query = insert(
+                    CourseSectionToInstructorAssociation
+                ).values(
+                    [
+                        {
+                            "instructor_id": insert_ins_res.id,
+                            "course_section_id": csid,
+                        }
+                        for csid in data.available_sections
+                    ]
+                )
+                await session.execute(insert_sections_query)
+                sections = (
+                    await session.execute(
+                        select(CourseSection).filter(
+                            CourseSection.id.in_(data.available_sections)
                         )
-                    ).scalars()
+                    )
+                ).scalars()
 
-                inst_obj = InstructorSchema.model_validate(insert_ins_res)
-                inst_obj.available_sections = [
-                    CourseSectionSchema.model_validate(item) for item in sections
-                ]
-                return InstructorCreated(instuctor=inst_obj)
-            else:
-                raise HTTPException(500, "error in adding")
-        except Exception as ex:
-            print(ex)
-            raise
+            inst_obj = InstructorSchema.model_validate(insert_ins_res)
+            inst_obj.available_sections = [
+                CourseSectionSchema.model_validate(item) for item in sections
+            ]
+            return InstructorCreated(instuctor=inst_obj)
+        else:
+            raise HTTPException(500, "error in adding")
 
 
 @router.delete(
@@ -103,10 +103,10 @@ async def new_instructor(data: AddInstructorIn, maker: SessionMaker, _: GetFullA
 )
 async def delete_instructor(
     _: GetFullAdmin,
-    maker: SessionMaker,
+    session: Session,
     data: DeleteInstructorIn,
 ) -> InstructorDeleted:
-    async with maker.begin() as session:
+    async with transaction(session):
         check_instructor = await session.execute(
             select(Instructor).where(Instructor.id == data.instructor_id)
         )
@@ -118,86 +118,54 @@ async def delete_instructor(
         query = delete(Instructor).where(Instructor.id == data.instructor_id)
 
         await session.execute(query)
+        get_principal_cache().invalidate_on_commit(
+            session, UserRole.INSTRUCTOR, data.instructor_id
+        )
+        get_slot_masks().invalidate_instructor_on_commit(session, data.instructor_id)
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.INSTRUCTOR, data.instructor_id)
         return InstructorDeleted(instructor=InstructorSchema.model_validate(instructor))
 
 
-@router.get("/all", response_model=InstructorListResponse)
+@router.get(
+    "/all", response_model=InstructorListResponse, response_model_exclude_unset=True
+)
 async def get_instructors(
-    maker: SessionMaker,
+    session: Session,
     _: GetFullAdmin,
     limit: int = Query(
-        10, ge=1, le=20, description="Maximum number of instructors to retrieve"
+        10, ge=1, le=100, description="Maximum number of instructors to retrieve"
+    ),
+    after: int = Query(
+        0, ge=0, description="Only instructors with a greater id (next_cursor)"
+    ),
+    fields: List[InstructorField] = Query(
+        list(get_args(InstructorField)), description="Fields to return"
+    ),
+    day_of_week: Optional[DayOfWeek] = Query(
+        None, description="Only instructors available on this day"
+    ),
+    start_time: Optional[int] = Query(
+        None, description="Only instructors available at this hour"
     ),
-    offset: int = Query(0, ge=0, description="Number of instructors to skip"),
 ):
     try:
-        async with maker.begin() as session:
-            # Query to fetch instructors and their course sections
-            query = (
-                select(Instructor, CourseSection)
-                .select_from(Instructor)
-                .join(
-                    CourseSectionToInstructorAssociation,
-                    CourseSectionToInstructorAssociation.instructor_id == Instructor.id,
-                    isouter=True,
-                )
-                .join(
-                    CourseSection,
-                    CourseSection.id
-                    == CourseSectionToInstructorAssociation.course_section_id,
-                    isouter=True,
-                )
-                .offset(offset)
-                .limit(limit)
+        async with transaction(session):
+            instructors, next_cursor = await get_instructor_service().list_instructors(
+                session, after, limit, fields, day_of_week, start_time
             )
-
-            # Execute query
-            instructors_query = await session.execute(query)
-            instructors = instructors_query.tuples().all()
-            print(instructors)
-            # Build instructor to course section mapping
-            maps: Dict[Instructor, list[CourseSection]] = {}
-            for tup in instructors:
-                inst, sec = tup
-                print(inst.first_name, inst.id)
-                if inst in maps.keys():
-                    maps[inst].append(sec)
-                else:
-                    maps[inst] = [sec]
-
-            # Validate and construct response
-            inst_objects = []
-            for inst in maps.keys():
-                try:
-                    schema = InstructorSchema.model_validate(inst)
-                    schema.available_sections = [
-                        CourseSectionSchema.model_validate(cs)
-                        for cs in maps[inst]
-                        if cs is not None
-                    ]
-                    inst_objects.append(schema)
-                except ValidationError as ve:
-                    raise HTTPException(
-                        status_code=422, detail=f"Validation error: {ve.errors()}"
-                    )
-
-            return InstructorListResponse(
-                instructors=inst_objects, total=len(inst_objects)
-            )
-
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    except ValidationError as ve:
-        raise HTTPException(status_code=422, detail=f"Validation error: {ve.errors()}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    return InstructorListResponse(
+        instructors=instructors, total=len(instructors), next_cursor=next_cursor
+    )
 
 
 @router.put("/update/{Instructor_id}")
 async def update_instructor(
-    _: GetFullAdmin, data: UpdateInstructorIn, maker: SessionMaker, Instructor_id
+    _: GetFullAdmin, data: UpdateInstructorIn, session: Session, Instructor_id
 ):
-    async with maker.begin() as session:
+    async with transaction(session):
         check_instructor = await session.execute(
             select(Instructor).where(Instructor.id == int(Instructor_id))
         )
@@ -226,6 +194,11 @@ async def update_instructor(
         )
 
         await session.execute(query)
+        get_principal_cache().invalidate_on_commit(
+            session, UserRole.INSTRUCTOR, Instructor_id
+        )
+        get_catalog_snapshot().bump_on_commit(session)
+        await publish(session, Change.INSTRUCTOR, Instructor_id)
 
         return {
             "message": "Instructor updated successfully",
@@ -236,14 +209,18 @@ async def update_instructor(
 @router.post("/enroll-section", response_model=SectionEnrolled)
 async def enroll_section(
     data: EnrollSectionIn,
-    maker: SessionMaker,
+    session: Session,
     _: UserRole = allowed_by(UserRole.INSTRUCTOR),
 ):
     instructor_service = get_instructor_service()
-    await instructor_service.enroll_section(data.instructor_id, data.section_id)
     section_service = get_section_service()
 
-    async with maker.begin() as session:
+    async with transaction(session):
+        await instructor_service.enroll_section(
+            session, data.instructor_id, data.section_id
+        )
+        get_slot_masks().invalidate_instructor_on_commit(session, data.instructor_id)
+        await publish(session, Change.INSTRUCTOR, data.instructor_id)
         return SectionEnrolled(
             section=CourseSectionSchema.model_validate(
                 await section_service.get_section_by_id(session, data.section_id)
@@ -108,9 +108,37 @@ class InstructorDeleted(ObjectDeleted):
     instructor: InstructorSchema
 
 
+InstructorField = Literal[
+    "id",
+    "first_name",
+    "last_name",
+    "national_id",
+    "email",
+    "username",
+    "phone_number",
+    "birth_day",
+    "available_sections",
+]
+
+
+class InstructorListItem(BaseModel):
+    # InstructorSchema with only the requested fields set
+    id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    national_id: Optional[NationalID] = None
+    email: Optional[EmailStr] = None
+    username: Optional[str] = None
+    phone_number: Optional[str] = None
+    birth_day: Optional[datetime.date] = None
+    available_sections: Optional[list[CourseSectionSchema]] = None
+
+
 class InstructorListResponse(BaseModel):
-    instructors: List[InstructorSchema]
+    instructors: List[InstructorListItem]
     total: int
+    # Pass as `after` to get the next page, None on the last page
+    next_cursor: Optional[int] = None
 
 
 class UpdateInstructorIn(BaseModel):
@@ -1,14 +1,38 @@
 from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
 
 import sqlalchemy as sa
+from sqlalchemy.orm import QueryableAttribute
 
 from src.course.exceptions import SectionNotFound
 from src.course.models import CourseSection, CourseSectionToInstructorAssociation
+from src.course.schemas import (
+    CourseSectionSchema,
+    DayOfWeek,
+    WeekMask,
+    overlaps,
+    slot_mask,
+    union,
+)
+from src.course.service import get_slot_masks
 from src.database import get_session_maker
 from src.dependencies import AsyncSession, async_sessionmaker
 from src.exceptions import GlobalException
 from src.instructor.exceptions import InstructorNotFound, SectionAlreadyEnrolled
 from src.instructor.models import Instructor
+from src.instructor.schemas import InstructorField, InstructorListItem
+
+# The fields list_instructors reads from the instructor row itself, the id
+# always comes first and available_sections come from a second query
+INSTRUCTOR_COLUMNS: Dict[str, QueryableAttribute[Any]] = {
+    "first_name": Instructor.first_name,
+    "last_name": Instructor.last_name,
+    "national_id": Instructor.national_id,
+    "email": Instructor.email,
+    "username": Instructor.username,
+    "phone_number": Instructor.phone_number,
+    "birth_day": Instructor.birth_day,
+}
 
 
 class InstructorService:
@@ -42,59 +66,157 @@ class InstructorService:
         ).scalar()
         return instructor
 
-    async def submit_section_enrollment(self, instructor_id: int):
-        async with self.session_maker.begin() as session:
-            instructor = await self.get_instructor_by_id(session, instructor_id)
-
-            if instructor is None:
-                raise GlobalException(InstructorNotFound(), 400)
-            instructor.is_enrollment_submited = True
-            session.add(instructor)
-            await session.refresh(instructor)
-
-    async def enroll_section(self, instructor_id: int, course_section_id: int):
-        async with self.session_maker.begin() as session:
-            # Check if instructor exists
-            is_instructor_exists = await self.is_instructor_exists(
-                session, instructor_id
-            )
-            if is_instructor_exists == 0:
-                raise GlobalException(InstructorNotFound(), 400)
+    async def submit_section_enrollment(
+        self, session: AsyncSession, instructor_id: int
+    ):
+        instructor = await self.get_instructor_by_id(session, instructor_id)
 
-            # Check if Course section exists
-            is_section_exists = (
-                await session.execute(
-                    sa.select(sa.exists().where(CourseSection.id == course_section_id))
+        if instructor is None:
+            raise GlobalException(InstructorNotFound(), 400)
+        instructor.is_enrollment_submited = True
+        session.add(instructor)
+        await session.refresh(instructor)
+
+    async def enrolled_slots(
+        self, session: AsyncSession, instructor_id: int
+    ) -> WeekMask:
+        masks = get_slot_masks()
+        enrolled = masks.instructors.get(instructor_id)
+        if enrolled is not None:
+            return enrolled
+        version = masks.version
+        rows = await session.execute(
+            sa.select(CourseSection.day_of_week, CourseSection.start_time)
+            .join(
+                CourseSectionToInstructorAssociation,
+                CourseSectionToInstructorAssociation.course_section_id
+                == CourseSection.id,
+            )
+            .where(CourseSectionToInstructorAssociation.instructor_id == instructor_id)
+        )
+        enrolled = union(*(slot_mask(day, start) for day, start in rows))
+        masks.set_instructor(version, instructor_id, enrolled)
+        return enrolled
+
+    async def enroll_section(
+        self, session: AsyncSession, instructor_id: int, course_section_id: int
+    ):
+        # Check if instructor exists
+        is_instructor_exists = await self.is_instructor_exists(session, instructor_id)
+        if is_instructor_exists == 0:
+            raise GlobalException(InstructorNotFound(), 400)
+
+        # Check if Course section exists
+        section = (
+            await session.execute(
+                sa.select(CourseSection.day_of_week, CourseSection.start_time).where(
+                    CourseSection.id == course_section_id
                 )
-            ).scalar() or False
-            if is_section_exists == 0:
-                raise GlobalException(SectionNotFound(), 400)
-
-            # Check if section already enrolled
-            is_section_enrolled = (
-                await session.execute(
-                    sa.select(sa.func.count())
-                    .select_from(CourseSectionToInstructorAssociation)
-                    .filter(
-                        CourseSectionToInstructorAssociation.course_section_id
-                        == course_section_id
-                    )
-                    .filter(
-                        CourseSectionToInstructorAssociation.instructor_id
-                        == instructor_id
-                    )
+            )
+        ).first()
+        if section is None:
+            raise GlobalException(SectionNotFound(), 400)
+
+        # Check if the section, or another one at the same time, is enrolled
+        enrolled = await self.enrolled_slots(session, instructor_id)
+        if overlaps(enrolled, slot_mask(*section)):
+            raise GlobalException(SectionAlreadyEnrolled(), 400)
+
+        # Enroll section for instructor
+        enroll_query = sa.insert(CourseSectionToInstructorAssociation).values(
+            {"course_section_id": course_section_id, "instructor_id": instructor_id}
+        )
+
+        await session.execute(enroll_query)
+
+    async def list_instructors(
+        self,
+        session: AsyncSession,
+        after: int,
+        limit: int,
+        fields: Sequence[InstructorField],
+        day_of_week: int | None = None,
+        start_time: int | None = None,
+    ) -> Tuple[List[InstructorListItem], int | None]:
+        # A page of instructor rows first, then the sections of exactly those
+        # instructors in one more query, so limit counts
+        # instructors and sections never multiply the rows.
+        columns = [
+            INSTRUCTOR_COLUMNS[field] for field in fields if field in INSTRUCTOR_COLUMNS
+        ]
+        query = (
+            sa.select(Instructor.id, *columns)
+            .where(Instructor.id > after)
+            .order_by(Instructor.id)
+            .limit(limit)
+        )
+        if day_of_week is not None or start_time is not None:
+            available = (
+                sa.select(CourseSectionToInstructorAssociation.instructor_id)
+                .join(
+                    CourseSection,
+                    CourseSection.id
+                    == CourseSectionToInstructorAssociation.course_section_id,
+                )
+                .where(
+                    CourseSectionToInstructorAssociation.instructor_id == Instructor.id
                 )
-            ).scalar() or 0
-
-            if is_section_enrolled == 1:
-                raise GlobalException(SectionAlreadyEnrolled(), 400)
-
-            # Enroll section for instructor
-            enroll_query = sa.insert(CourseSectionToInstructorAssociation).values(
-                {"course_section_id": course_section_id, "instructor_id": instructor_id}
             )
+            if day_of_week is not None:
+                available = available.where(
+                    CourseSection.day_of_week == DayOfWeek(day_of_week)
+                )
+            if start_time is not None:
+                available = available.where(CourseSection.start_time == start_time)
+            query = query.where(available.exists())
+
+        rows = (await session.execute(query)).all()
+        items: Dict[int, Dict[str, Any]] = {}
+        for instructor_id, *values in rows:
+            item = items[instructor_id] = {
+                column.key: value for column, value in zip(columns, values)
+            }
+            if "id" in fields:
+                item["id"] = instructor_id
+
+        if "available_sections" in fields and items:
+            for item in items.values():
+                item["available_sections"] = []
+            for (
+                instructor_id,
+                section_id,
+                day,
+                start,
+                end,
+            ) in await session.execute(
+                sa.select(
+                    CourseSectionToInstructorAssociation.instructor_id,
+                    CourseSection.id,
+                    CourseSection.day_of_week,
+                    CourseSection.start_time,
+                    CourseSection.end_time,
+                )
+                .join(
+                    CourseSection,
+                    CourseSection.id
+                    == CourseSectionToInstructorAssociation.course_section_id,
+                )
+                .where(CourseSectionToInstructorAssociation.instructor_id.in_(items))
+                .order_by(CourseSection.day_of_week, CourseSection.start_time)
+            ):
+                items[instructor_id]["available_sections"].append(
+                    CourseSectionSchema.model_validate(
+                        {
+                            "id": section_id,
+                            "day_of_week": day,
+                            "start_time": start,
+                            "end_time": end,
+                        }
+                    )
+                )
 
-            await session.execute(enroll_query)
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return [InstructorListItem(**item) for item in items.values()], next_cursor
 
 
 @lru_cache()
@@ -0,0 +1,125 @@
+import bisect
+import logging
+import random
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+
+from src.config import config
+from src.constants import (
+    SLOW_QUERIES_SIZE,
+    SQL_LATENCY_BUCKETS_MS,
+    SQL_STATEMENTS_SIZE,
+)
+from src.schemas import SlowQuery, SqlStats, StatementStats
+
+logger = logging.getLogger("src.sql")
+
+# Statements past SQL_STATEMENTS_SIZE are counted together under this key
+OTHER = "<other>"
+
+
+class StatementTimes:
+    __slots__ = ("buckets", "count", "errors", "max_seconds", "rows", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+        # One more than SQL_LATENCY_BUCKETS_MS, for the slower ones
+        self.buckets = [0] * (len(SQL_LATENCY_BUCKETS_MS) + 1)
+
+
+class QueryStats:
+    # Per statement latency histogram, row count and errors, fed by engine
+    # events instead of echo=True. A statement is keyed by its SQL before
+    # IN lists are expanded, so the pre-built statements of src/statements.py
+    # each get one entry. Statements slower than `slow_ms` are logged and
+    # the last SLOW_QUERIES_SIZE of them kept, and `sample_rate` of all
+    # statements are logged with their text. The logging only queues the
+    # record, see src/logs.py. Events run on the event loop, so the counters
+    # need no lock.
+    def __init__(self, slow_ms: float, sample_rate: float):
+        self.slow_seconds = slow_ms / 1000
+        self.sample_rate = sample_rate
+        self.statements: Dict[str, StatementTimes] = {}
+        self.slow: Deque[SlowQuery] = deque(maxlen=SLOW_QUERIES_SIZE)
+        self.sampled = 0
+
+    def instrument(self, engine: Engine):
+        sa.event.listen(engine, "before_cursor_execute", self._before)
+        sa.event.listen(engine, "after_cursor_execute", self._after)
+        sa.event.listen(engine, "handle_error", self._error)
+
+    def stats(self) -> SqlStats:
+        return SqlStats(
+            statements=[
+                StatementStats(
+                    statement=statement,
+                    count=times.count,
+                    mean_ms=times.seconds / times.count * 1000 if times.count else 0,
+                    max_ms=times.max_seconds * 1000,
+                    rows=times.rows,
+                    errors=times.errors,
+                    buckets_ms=list(SQL_LATENCY_BUCKETS_MS),
+                    counts=list(times.buckets),
+                )
+                for statement, times in sorted(
+                    self.statements.items(), key=lambda item: -item[1].seconds
+                )
+            ],
+            slow=list(self.slow),
+            sampled=self.sampled,
+        )
+
+    def _times(self, context) -> StatementTimes:
+        compiled = context.compiled
+        statement = compiled.string if compiled is not None else context.statement
+        times = self.statements.get(statement)
+        if times is None:
+            if len(self.statements) >= SQL_STATEMENTS_SIZE:
+                statement = OTHER
+                times = self.statements.get(OTHER)
+            if times is None:
+                times = self.statements[statement] = StatementTimes()
+        return times
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        times = self._times(context)
+        times.count += 1
+        times.seconds += elapsed
+        times.max_seconds = max(times.max_seconds, elapsed)
+        rows = max(cursor.rowcount, 0)
+        times.rows += rows
+        times.buckets[bisect.bisect_left(SQL_LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+        if elapsed >= self.slow_seconds:
+            self.slow.append(
+                SlowQuery(statement=statement, ms=elapsed * 1000, rows=rows)
+            )
+            logger.warning(
+                "slow query %.1f ms %d rows: %s", elapsed * 1000, rows, statement
+            )
+        elif self.sample_rate and random.random() < self.sample_rate:
+            self.sampled += 1
+            logger.info("query %.1f ms %d rows: %s", elapsed * 1000, rows, statement)
+
+    def _error(self, exception_context):
+        context = exception_context.execution_context
+        if context is not None:
+            self._times(context).errors += 1
+
+
+@lru_cache()
+def get_query_stats() -> QueryStats:
+    return QueryStats(config.SQL_SLOW_QUERY_MS, config.SQL_SAMPLE_RATE)
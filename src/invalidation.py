@@ -0,0 +1,175 @@
+import asyncio
+import enum
+import json
+import logging
+import uuid
+from functools import lru_cache, partial
+from typing import Iterable, List
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import config
+from src.cutsom_types import StudnentID
+from src.database import AsyncSession, engine, get_replica_router
+from src.schemas import UserRole
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+# Postgres rejects NOTIFY payloads of 8000 bytes and more
+MAX_PAYLOAD = 7000
+# Tells this process' own events apart, its caches were updated in place
+ORIGIN = uuid.uuid4().hex
+
+
+class Change(str, enum.Enum):
+    CATALOG = "catalog"
+    STUDENT = "student"
+    INSTRUCTOR = "instructor"
+    TOKEN = "token"
+
+
+def _payloads(change: Change, keys: Iterable[int | str]) -> List[str]:
+    payloads = []
+    chunk: List[str] = []
+    size = 0
+    for key in keys:
+        key = str(key)
+        if chunk and size + len(key) > MAX_PAYLOAD:
+            payloads.append(json.dumps([ORIGIN, change.value, chunk]))
+            chunk, size = [], 0
+        chunk.append(key)
+        size += len(key) + 4
+    payloads.append(json.dumps([ORIGIN, change.value, chunk]))
+    return payloads
+
+
+def sticky_key(change: Change, key: int | str | None = None) -> str:
+    # What ReplicaRouter keeps on the primary after the change: the single
+    # changed student or instructor, or anything that is built from all of
+    # them (a catalog snapshot).
+    return change.value if key is None else f"{change.value}:{key}"
+
+
+def _sticky_keys(change: Change, keys: Iterable[int | str]) -> List[str]:
+    return [sticky_key(change), *(sticky_key(change, key) for key in keys)]
+
+
+async def publish(session: AsyncSession, change: Change, *keys: int | str):
+    # NOTIFY is transactional: other workers only hear about the change once
+    # the session commits, and never if it rolls back.
+    get_replica_router().stick_on_commit(session, *_sticky_keys(change, keys))
+    for payload in _payloads(change, keys):
+        await session.execute(sa.select(sa.func.pg_notify(CHANNEL, payload)))
+
+
+def apply(change: Change, keys: List[str]):
+    # The caches are imported here, so a router that only publishes changes
+    # does not import every service that keeps one
+    from src.authentication.service import get_principal_cache, get_revoked_tokens
+    from src.course.service import get_catalog_snapshot, get_slot_masks
+    from src.student.service import get_reservation_service
+
+    get_replica_router().stick(*_sticky_keys(change, keys))
+    if change == Change.CATALOG:
+        get_reservation_service().clear()
+        get_catalog_snapshot().bump()
+        get_slot_masks().clear()
+    elif change == Change.STUDENT:
+        service = get_reservation_service()
+        cache = get_principal_cache()
+        for key in keys:
+            service.invalidate_student(StudnentID(key))
+            cache.invalidate(UserRole.STUDENT, key)
+    elif change == Change.INSTRUCTOR:
+        cache = get_principal_cache()
+        masks = get_slot_masks()
+        for key in keys:
+            cache.invalidate(UserRole.INSTRUCTOR, key)
+            masks.invalidate_instructor(int(key))
+        get_catalog_snapshot().bump()
+    elif change == Change.TOKEN:
+        get_revoked_tokens().revoke(*keys)
+
+
+def clear_all():
+    from src.authentication.service import get_principal_cache
+    from src.course.service import get_catalog_snapshot, get_slot_masks
+    from src.student.service import get_reservation_service
+
+    get_reservation_service().clear()
+    get_principal_cache().clear()
+    get_catalog_snapshot().bump()
+    get_slot_masks().clear()
+
+
+class InvalidationListener:
+    # Holds one pooled connection that LISTENs for the changes published by
+    # the other workers and evicts the matching local cache entries. While
+    # the connection is down events can be missed, so every (re)connect
+    # starts from empty caches.
+    def __init__(self, engine: AsyncEngine, retry_seconds: float):
+        self.engine = engine
+        self.retry_seconds = retry_seconds
+        self.task: asyncio.Task | None = None
+        self.received = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        try:
+            origin, change, keys = json.loads(payload)
+            change = Change(change)
+        except (ValueError, TypeError):
+            return
+        self.received += 1
+        if origin != ORIGIN:
+            apply(change, keys)
+
+    def _on_terminated(self, lost: asyncio.Event, connection):
+        lost.set()
+
+    async def _listen(self):
+        from src.authentication.service import get_revoked_tokens
+
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    driver = (await conn.get_raw_connection()).driver_connection
+                    assert driver is not None
+                    lost = asyncio.Event()
+                    # Bound to this connection's event, a later close must
+                    # not end the wait on the next connection
+                    on_lost = partial(self._on_terminated, lost)
+                    driver.add_termination_listener(on_lost)
+                    try:
+                        await driver.add_listener(CHANNEL, self._on_notify)
+                        clear_all()
+                        # Revocations are not a cache that can start empty
+                        await get_revoked_tokens().load(conn)
+                        await conn.commit()
+                        await lost.wait()
+                    finally:
+                        driver.remove_termination_listener(on_lost)
+                        # Still LISTENing, so it must not go back to the pool
+                        await conn.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning("invalidation listener: %r", ex)
+            clear_all()
+            await asyncio.sleep(self.retry_seconds)
+
+
+@lru_cache()
+def get_invalidation_listener() -> InvalidationListener:
+    return InvalidationListener(engine, config.INVALIDATION_RETRY_SECONDS)
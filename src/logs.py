@@ -0,0 +1,77 @@
+import logging
+import queue
+import sys
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+
+from src.config import config
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Never blocks the event loop on a full queue, the record is dropped and
+    # counted instead. QueueHandler.prepare merges the arguments into the
+    # message before queueing, while they still hold the values they had
+    # when logged; the listener's thread only adds the prefix and writes.
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    # Set by QueueListener, the stubs know neither the sentinel nor that
+    # LogQueue hands it a queue.Queue
+    queue: queue.Queue
+    _sentinel: None
+
+    def enqueue_sentinel(self):
+        # QueueListener.stop puts its sentinel with put_nowait, which raises
+        # queue.Full on a full queue; waiting lets the thread write what is
+        # queued first
+        self.queue.put(self._sentinel)
+
+
+class LogQueue:
+    # The "src" loggers only put their records on a bounded queue, a thread
+    # formats and writes them, so logging costs a request no write to
+    # stderr.
+    def __init__(self, size: int, level: str):
+        self.records: queue.Queue = queue.Queue(size)
+        self.handler = DroppingQueueHandler(self.records)
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+        )
+        self.listener = DrainingQueueListener(self.records, stream)
+        self.level = level
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        logger = logging.getLogger("src")
+        logger.setLevel(self.level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        self.listener.start()
+        self.started = True
+
+    def stop(self):
+        if not self.started:
+            return
+        logger = logging.getLogger("src")
+        logger.removeHandler(self.handler)
+        logger.propagate = True
+        # Writes what is still queued
+        self.listener.stop()
+        self.started = False
+
+
+@lru_cache()
+def get_log_queue() -> LogQueue:
+    return LogQueue(config.LOG_QUEUE_SIZE, config.LOG_LEVEL)
@@ -0,0 +1,181 @@
+import bisect
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from src.constants import REQUEST_LATENCY_BUCKETS
+
+# Label of the requests that matched no route, so scanners probing random
+# paths can not grow the histograms without bound
+UNMATCHED = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One more than `buckets`, for the values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    def __init__(
+        self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = buckets
+        self.children: Dict[Tuple[str, ...], Histogram] = {}
+
+    def labels(self, *values: str) -> Histogram:
+        histogram = self.children.get(values)
+        if histogram is None:
+            histogram = self.children[values] = Histogram(self.buckets)
+        return histogram
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, histogram in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                le = _labels(self.label_names, values, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.label_names, values, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {histogram.count}"
+            labels = _labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {histogram.sum}"
+            yield f"{self.name}_count{labels} {histogram.count}"
+
+
+class GaugeFamily:
+    # Read when scraped, from the objects that already keep the value
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.children: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def add(self, values: Tuple[str, ...], read: Callable[[], float]):
+        self.children[values] = read
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for values, read in list(self.children.items()):
+            yield f"{self.name}{_labels(self.label_names, values)} {read()}"
+
+
+class Metrics:
+    # Prometheus text exposition of the histograms and gauges the modules
+    # register. Everything is updated on the event loop thread, so the
+    # counters are plain ints and floats without locks, and whatever a
+    # component already counts (pool usage, queue depths) is only read when
+    # /metrics is scraped.
+    def __init__(self):
+        self.families: Dict[str, HistogramFamily | GaugeFamily] = {}
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]
+    ) -> HistogramFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = HistogramFamily(name, help, labels, buckets)
+        assert isinstance(family, HistogramFamily)
+        return family
+
+    def gauge(self, name: str, help: str, labels: Sequence[str]) -> GaugeFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = GaugeFamily(name, help, labels)
+        assert isinstance(family, GaugeFamily)
+        return family
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache()
+def get_metrics() -> Metrics:
+    return Metrics()
+
+
+def executor_metrics(
+    name: str, pending: Callable[[], float], queue_depth: Callable[[], float]
+):
+    metrics = get_metrics()
+    metrics.gauge(
+        "executor_pending", "Calls running or waiting for a worker", ("executor",)
+    ).add((name,), pending)
+    metrics.gauge(
+        "executor_queue_depth", "Calls waiting for a worker", ("executor",)
+    ).add((name,), queue_depth)
+
+
+class MetricsMiddleware:
+    # Times every request by method, route template and status. A plain ASGI
+    # middleware: BaseHTTPMiddleware would cost a task and a stream per
+    # request.
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        metrics = get_metrics()
+        self.latency = metrics.histogram(
+            "http_request_duration_seconds",
+            "Time to the end of the response",
+            ("method", "route", "status"),
+            REQUEST_LATENCY_BUCKETS,
+        )
+        metrics.gauge("http_requests_in_flight", "Requests being handled", ()).add(
+            (), lambda: self.in_flight
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.in_flight -= 1
+            route = scope.get("route")
+            self.latency.labels(
+                scope["method"],
+                getattr(route, "path", UNMATCHED),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
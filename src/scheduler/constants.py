@@ -0,0 +1,3 @@
+# How many times the local search walks over every scheduled course
+LOCAL_SEARCH_PASSES = 3
+INSERT_CHUNK_SIZE = 1000
@@ -0,0 +1,10 @@
+from typing import Literal
+
+from src.schemas import BaseError, ErrorCode
+
+
+class NoSectionsDefined(BaseError):
+    code: Literal[ErrorCode.NO_SECTIONS_DEFINED] = ErrorCode.NO_SECTIONS_DEFINED
+    details: Literal[
+        "No course section defined to build the schedule on."
+    ] = "No course section defined to build the schedule on."
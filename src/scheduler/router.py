@@ -0,0 +1,18 @@
+from fastapi import APIRouter, status
+
+from src.authentication.dependencies import GetFullAdmin
+from src.scheduler.exceptions import NoSectionsDefined
+from src.scheduler.schemas import BuildScheduleIn, ScheduleBuilt
+from src.scheduler.service import get_scheduler_service
+
+router = APIRouter(prefix="/scheduler", tags=["Scheduler"])
+
+
+@router.post(
+    "/build",
+    status_code=status.HTTP_200_OK,
+    responses={400: {"model": NoSectionsDefined}},
+    tags=["ByAdmin"],
+)
+async def build_schedule(data: BuildScheduleIn, _: GetFullAdmin) -> ScheduleBuilt:
+    return await get_scheduler_service().build(data.dry_run)
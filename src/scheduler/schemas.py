@@ -0,0 +1,24 @@
+from typing import List, Literal
+
+from pydantic import BaseModel
+
+from src.schemas import Messages, SuccessCodes
+
+
+class BuildScheduleIn(BaseModel):
+    dry_run: bool = False
+
+
+class ScheduledCourse(BaseModel):
+    course_id: int
+    section_ids: List[int]
+
+
+class ScheduleBuilt(BaseModel):
+    code: Literal[SuccessCodes.SCHEDULE_BUILT] = SuccessCodes.SCHEDULE_BUILT
+    message: Literal[Messages.SCHEDULE_BUILT] = Messages.SCHEDULE_BUILT
+    scheduled: List[ScheduledCourse]
+    unscheduled: List[int]
+    student_conflicts: int
+    solve_seconds: float
+    dry_run: bool
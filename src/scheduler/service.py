@@ -0,0 +1,183 @@
+import itertools
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import sqlalchemy as sa
+
+from src.authentication.utils import to_async
+from src.course.models import (
+    Course,
+    CourseSection,
+    CourseSectionToCourseAssociation,
+    CourseSectionToInstructorAssociation,
+)
+from src.course.schemas import FULL_WEEK, iter_slots, section_slot
+from src.course.service import get_catalog_snapshot
+from src.database import AsyncSession, async_sessionmaker, get_session_maker
+from src.exceptions import GlobalException
+from src.instructor.models import CourseInstructor
+from src.invalidation import Change, publish
+from src.scheduler.constants import INSERT_CHUNK_SIZE
+from src.scheduler.exceptions import NoSectionsDefined
+from src.scheduler.schemas import ScheduleBuilt, ScheduledCourse
+from src.scheduler.solver import SchedulingProblem, build_neighbours, solve
+from src.student.models import ReservedCourse
+from src.student.service import get_reservation_service
+
+
+class SchedulerService:
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+        self.session_maker = session_maker
+
+    async def load_problem(
+        self, session: AsyncSession
+    ) -> Tuple[SchedulingProblem, Dict[int, List[int]]]:
+        sections = (
+            await session.execute(
+                sa.select(
+                    CourseSection.id,
+                    CourseSection.day_of_week,
+                    CourseSection.start_time,
+                )
+            )
+        ).all()
+        if not sections:
+            raise GlobalException(NoSectionsDefined(), 400)
+
+        # Several sections can share a day and start time
+        slot_to_sections: Dict[int, List[int]] = {}
+        section_to_slot: Dict[int, int] = {}
+        for section_id, day, start in sections:
+            slot = section_slot(day, start)
+            slot_to_sections.setdefault(slot, []).append(section_id)
+            section_to_slot[section_id] = slot
+        open_slots = 0
+        for slot in slot_to_sections:
+            open_slots |= 1 << slot
+
+        courses = (
+            await session.execute(
+                sa.select(Course.id, Course.sections_count, Course.importance)
+                .where(Course.is_active.is_(True))
+                .order_by(Course.id)
+            )
+        ).all()
+        position = {row[0]: i for i, row in enumerate(courses)}
+
+        availability: Dict[int, int] = {}
+        for instructor_id, section_id in (
+            await session.execute(
+                sa.select(
+                    CourseSectionToInstructorAssociation.instructor_id,
+                    CourseSectionToInstructorAssociation.course_section_id,
+                )
+            )
+        ).all():
+            held_slot = section_to_slot.get(section_id)
+            if held_slot is not None:
+                availability[instructor_id] = availability.get(instructor_id, 0) | (
+                    1 << held_slot
+                )
+
+        instructor_index: Dict[int, int] = {}
+        teachers: List[List[int]] = [[] for _ in courses]
+        allowed = [open_slots] * len(courses)
+        for course_id, instructor_id in (
+            await session.execute(
+                sa.select(CourseInstructor.course_id, CourseInstructor.instructor_id)
+            )
+        ).all():
+            i = position.get(course_id)
+            if i is None:
+                continue
+            index = instructor_index.setdefault(instructor_id, len(instructor_index))
+            teachers[i].append(index)
+            # Instructors that never declared their free times can teach anytime
+            allowed[i] &= availability.get(instructor_id, FULL_WEEK)
+
+        reservations: Dict[str, List[int]] = {}
+        for student_id, course_id in (
+            await session.execute(
+                sa.select(ReservedCourse.student_id, ReservedCourse.course_id)
+            )
+        ).all():
+            i = position.get(course_id)
+            if i is not None:
+                reservations.setdefault(student_id, []).append(i)
+
+        problem = SchedulingProblem(
+            course_ids=[row[0] for row in courses],
+            sections_needed=[row[1] for row in courses],
+            importance=[row[2] for row in courses],
+            teachers=[tuple(t) for t in teachers],
+            allowed=allowed,
+            neighbours=build_neighbours(len(courses), list(reservations.values())),
+            instructors_count=len(instructor_index),
+        )
+        return problem, slot_to_sections
+
+    async def save_assignment(
+        self, session: AsyncSession, course_ids: List[int], rows: List[Dict[str, int]]
+    ):
+        await session.execute(
+            sa.delete(CourseSectionToCourseAssociation).where(
+                CourseSectionToCourseAssociation.course_id.in_(course_ids)
+            )
+        )
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            await session.execute(
+                sa.insert(CourseSectionToCourseAssociation).values(
+                    rows[start : start + INSERT_CHUNK_SIZE]
+                )
+            )
+
+    async def build(self, dry_run: bool = False) -> ScheduleBuilt:
+        # The solve runs on a worker thread between two transactions, so it
+        # holds no pooled connection and does not stall the event loop
+        async with self.session_maker.begin() as session:
+            problem, slot_to_sections = await self.load_problem(session)
+
+        started = time.perf_counter()
+        solution = await to_async(solve, problem)
+        elapsed = time.perf_counter() - started
+
+        # Courses placed in a slot with several sections take them in turn
+        turns = {
+            slot: itertools.cycle(section_ids)
+            for slot, section_ids in slot_to_sections.items()
+        }
+        scheduled: List[ScheduledCourse] = []
+        rows: List[Dict[str, int]] = []
+        for i, mask in enumerate(solution.assigned):
+            if not mask:
+                continue
+            course_id = problem.course_ids[i]
+            section_ids = [next(turns[slot]) for slot in iter_slots(mask)]
+            scheduled.append(
+                ScheduledCourse(course_id=course_id, section_ids=section_ids)
+            )
+            rows.extend(
+                {"course_id": course_id, "course_section_id": section_id}
+                for section_id in section_ids
+            )
+
+        if not dry_run and problem.course_ids:
+            async with self.session_maker.begin() as session:
+                await self.save_assignment(session, problem.course_ids, rows)
+                get_reservation_service().clear_on_commit(session)
+                get_catalog_snapshot().bump_on_commit(session)
+                await publish(session, Change.CATALOG)
+
+        return ScheduleBuilt(
+            scheduled=scheduled,
+            unscheduled=[problem.course_ids[i] for i in solution.unscheduled],
+            student_conflicts=solution.student_conflicts,
+            solve_seconds=elapsed,
+            dry_run=dry_run,
+        )
+
+
+@lru_cache()
+def get_scheduler_service() -> SchedulerService:
+    return SchedulerService(get_session_maker())
@@ -0,0 +1,224 @@
+from typing import Dict, List, Sequence, Tuple
+
+from src.course.constants import BLOCKS_PER_DAY, WEEK_SLOTS
+from src.course.schemas import iter_slots
+from src.scheduler.constants import LOCAL_SEARCH_PASSES
+
+
+class SchedulingProblem:
+    # Plain parallel lists indexed by course position, built once by the service
+    # from the database rows so the search never touches SQLAlchemy objects.
+    # Every set of slots is a WeekMask, so conflict checks are a single `&`.
+    def __init__(
+        self,
+        course_ids: List[int],
+        sections_needed: List[int],
+        importance: List[int],
+        teachers: List[Tuple[int, ...]],
+        allowed: List[int],
+        neighbours: List[Dict[int, int]],
+        instructors_count: int,
+    ):
+        self.course_ids = course_ids
+        self.sections_needed = sections_needed
+        self.importance = importance
+        self.teachers = teachers
+        self.allowed = allowed
+        self.neighbours = neighbours
+        self.instructors_count = instructors_count
+
+    def __len__(self) -> int:
+        return len(self.course_ids)
+
+
+class Solution:
+    def __init__(self, assigned: List[int], student_conflicts: int):
+        self.assigned = assigned
+        self.student_conflicts = student_conflicts
+
+    @property
+    def unscheduled(self) -> List[int]:
+        return [i for i, mask in enumerate(self.assigned) if mask == 0]
+
+
+def build_neighbours(
+    courses_count: int, reservations: Sequence[Sequence[int]]
+) -> List[Dict[int, int]]:
+    # reservations holds, per student, the positions of the courses they reserved.
+    # Two courses sharing students should not be held at the same time.
+    neighbours: List[Dict[int, int]] = [{} for _ in range(courses_count)]
+    for courses in reservations:
+        for x, first in enumerate(courses):
+            row = neighbours[first]
+            for second in courses[x + 1 :]:
+                if first == second:
+                    continue
+                row[second] = row.get(second, 0) + 1
+                other = neighbours[second]
+                other[first] = other.get(first, 0) + 1
+    return neighbours
+
+
+class Scheduler:
+    def __init__(self, problem: SchedulingProblem):
+        self.problem = problem
+        self.assigned = [0] * len(problem)
+        self.busy = [0] * problem.instructors_count
+        # (instructor * WEEK_SLOTS + slot) -> course position holding it
+        self.holder: Dict[int, int] = {}
+
+    def solve(self, passes: int = LOCAL_SEARCH_PASSES) -> Solution:
+        p = self.problem
+        # Most constrained and most important courses pick their slots first.
+        order = sorted(
+            range(len(p)),
+            key=lambda i: (
+                p.allowed[i].bit_count() - p.sections_needed[i],
+                -p.importance[i],
+            ),
+        )
+        for i in order:
+            mask = self._choose(i)
+            if mask is None:
+                mask = self._repair(i)
+            if mask is not None:
+                self._assign(i, mask)
+
+        for _ in range(passes):
+            if not self._improve(order):
+                break
+
+        return Solution(self.assigned, self.student_conflicts())
+
+    def student_conflicts(self) -> int:
+        total = 0
+        assigned = self.assigned
+        for i, row in enumerate(self.problem.neighbours):
+            mask = assigned[i]
+            if not mask:
+                continue
+            for j, weight in row.items():
+                if j > i and mask & assigned[j]:
+                    total += weight * (mask & assigned[j]).bit_count()
+        return total
+
+    def _teachers_busy(self, i: int) -> int:
+        busy = 0
+        for t in self.problem.teachers[i]:
+            busy |= self.busy[t]
+        return busy
+
+    def _slot_costs(self, i: int) -> Dict[int, int]:
+        costs: Dict[int, int] = {}
+        assigned = self.assigned
+        for j, weight in self.problem.neighbours[i].items():
+            for slot in iter_slots(assigned[j]):
+                costs[slot] = costs.get(slot, 0) + weight
+        return costs
+
+    def _choose(self, i: int) -> int | None:
+        p = self.problem
+        need = p.sections_needed[i]
+        free = p.allowed[i] & ~self._teachers_busy(i)
+        if free.bit_count() < need:
+            return None
+        costs = self._slot_costs(i)
+        candidates = sorted(iter_slots(free), key=lambda s: costs.get(s, 0))
+
+        # Prefer spreading the sessions of a course over different days and
+        # only fall back to a second block on the same day if that is impossible.
+        mask = 0
+        days = 0
+        for slot in candidates:
+            day = 1 << (slot // BLOCKS_PER_DAY)
+            if not days & day:
+                mask |= 1 << slot
+                days |= day
+                need -= 1
+                if need == 0:
+                    return mask
+        for slot in candidates:
+            if not mask & (1 << slot):
+                mask |= 1 << slot
+                need -= 1
+                if need == 0:
+                    return mask
+        return None
+
+    def _assign(self, i: int, mask: int):
+        self.assigned[i] = mask
+        for t in self.problem.teachers[i]:
+            self.busy[t] |= mask
+            for slot in iter_slots(mask):
+                self.holder[t * WEEK_SLOTS + slot] = i
+
+    def _release(self, i: int):
+        mask = self.assigned[i]
+        self.assigned[i] = 0
+        for t in self.problem.teachers[i]:
+            self.busy[t] &= ~mask
+            for slot in iter_slots(mask):
+                self.holder.pop(t * WEEK_SLOTS + slot, None)
+
+    def _repair(self, i: int) -> int | None:
+        # One level of backtracking: move a course of the same instructor that
+        # sits on a slot this course could use, then retry both of them.
+        p = self.problem
+        tried = set()
+        blocked = p.allowed[i] & self._teachers_busy(i)
+        for slot in iter_slots(blocked):
+            for t in p.teachers[i]:
+                j = self.holder.get(t * WEEK_SLOTS + slot)
+                if j is None or j in tried:
+                    continue
+                tried.add(j)
+                old = self.assigned[j]
+                self._release(j)
+                mask = self._choose(i)
+                if mask is not None:
+                    self._assign(i, mask)
+                    moved = self._choose(j)
+                    if moved is not None:
+                        self._assign(j, moved)
+                        self._release(i)
+                        return mask
+                    self._release(i)
+                self._assign(j, old)
+        return None
+
+    def _improve(self, order: List[int]) -> bool:
+        # Min-conflicts local search: move single sessions of courses that clash
+        # with courses of the same students to a cheaper free slot.
+        p = self.problem
+        improved = False
+        for i in order:
+            mask = self.assigned[i]
+            if not mask or not p.neighbours[i]:
+                continue
+            costs = self._slot_costs(i)
+            for slot in iter_slots(mask):
+                current = costs.get(slot, 0)
+                if current == 0:
+                    continue
+                mask = self.assigned[i]
+                rest = mask & ~(1 << slot)
+                days = 0
+                for other in iter_slots(rest):
+                    days |= 1 << (other // BLOCKS_PER_DAY)
+                free = p.allowed[i] & ~self._teachers_busy(i) & ~mask
+                best = None
+                for target in iter_slots(free):
+                    if days & (1 << (target // BLOCKS_PER_DAY)):
+                        continue
+                    cost = costs.get(target, 0)
+                    if cost < current:
+                        best, current = target, cost
+                if best is not None:
+                    self._release(i)
+                    self._assign(i, rest | (1 << best))
+                    improved = True
+        return improved
+
+
+def solve(problem: SchedulingProblem, passes: int = LOCAL_SEARCH_PASSES) -> Solution:
+    return Scheduler(problem).solve(passes)
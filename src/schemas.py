@@ -19,6 +19,10 @@ class SuccessCodes(str, enum.Enum):
     SECTION_DELETED = "SECTION_DELETED"
     COURSE_RESERVED = "COURSE_RESERVED"
     COURSE_UNRESERVED = "COURSE_UNRESERVED"
+    SCHEDULE_BUILT = "SCHEDULE_BUILT"
+    RESERVATION_QUEUED = "RESERVATION_QUEUED"
+    STUDENTS_IMPORTED = "STUDENTS_IMPORTED"
+    LOGGED_OUT = "LOGGED_OUT"
 
 
 class Messages(str, enum.Enum):
@@ -31,6 +35,8 @@ class Messages(str, enum.Enum):
     SECTION_DELETED = "Section deleted successfully"
     SECTION_ADDED = "Section added successfully"
     COURSE_ADDED = "Course added successfully"
+    SCHEDULE_BUILT = "Schedule built successfully"
+    STUDENTS_IMPORTED = "Students imported"
 
 
 class UserRole(enum.StrEnum):
@@ -42,6 +48,7 @@ class UserRole(enum.StrEnum):
 
 class ErrorCode(str, enum.Enum):
     COURSE_NOT_FOUND = "COURSE_NOT_FOUND"
+    COURSE_FULL = "COURSE_FULL"
     SECTION_NOT_FOUND = "SECTION_NOT_FOUND"
     STUDENT_NOT_FOUND = "STUDENT_NOT_FOUND"
     STUDENT_DUPLICATE = "STUDENT_DUPLICATE"
@@ -57,6 +64,16 @@ class ErrorCode(str, enum.Enum):
     SECTION_COUNT_MORE_THAN_ZERO = "SECTION_COUNT_MORE_THAN_ZERO"
     COURSE_UNIT_MORE_THAN_ZERO = "COURSE_UNIT_MORE_THAN_ZERO"
     SECTION_ALREADY_ENROLLED = "SECTION_ALREADY_ENROLLED"
+    NO_SECTIONS_DEFINED = "NO_SECTIONS_DEFINED"
+    TIME_CONFLICT = "TIME_CONFLICT"
+    UNIT_LIMIT_EXCEEDED = "UNIT_LIMIT_EXCEEDED"
+    RESERVATION_QUEUE_FULL = "RESERVATION_QUEUE_FULL"
+    TICKET_NOT_FOUND = "TICKET_NOT_FOUND"
+    HASHING_BUSY = "HASHING_BUSY"
+    INVALID_IMPORT_ROW = "INVALID_IMPORT_ROW"
+    INVALID_IMPORT_FILE = "INVALID_IMPORT_FILE"
+    INVALID_REFRESH_TOKEN = "INVALID_REFRESH_TOKEN"
+    MAIL_QUEUE_FULL = "MAIL_QUEUE_FULL"
 
 
 class BaseUser(BaseModel):
@@ -117,3 +134,36 @@ class ObjectDeleted(BaseModel):
 class BaseError(BaseModel):
     code: ErrorCode
     details: str
+
+
+class Readiness(BaseModel):
+    ready: bool
+    schema_version: int
+    migrated: bool
+    app_seconds: float
+    bootstrap_seconds: float
+    cold_start_seconds: float
+
+
+class StatementStats(BaseModel):
+    statement: str
+    count: int
+    mean_ms: float
+    max_ms: float
+    rows: int
+    errors: int
+    # counts[i] statements took up to buckets_ms[i], the last one longer
+    buckets_ms: list[float]
+    counts: list[int]
+
+
+class SlowQuery(BaseModel):
+    statement: str
+    ms: float
+    rows: int
+
+
+class SqlStats(BaseModel):
+    statements: list[StatementStats]
+    slow: list[SlowQuery]
+    sampled: int
@@ -0,0 +1,210 @@
+# Statements of the hot request paths, built once at import and executed
+# with their parameters bound by name. Building a Core expression and
+# deriving its cache key on every request is measurable CPU time on a small
+# container; a statement object that is reused keeps its memoized cache key,
+# so SQLAlchemy finds the compiled form in the engine's compiled cache and
+# asyncpg reuses the server side prepared statement of the connection.
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from src.course.models import Course, CourseSection, CourseSectionToCourseAssociation
+from src.instructor.models import CourseInstructor, Instructor
+from src.models import Admin
+from src.schemas import UserRole
+from src.student.models import ReservedCourse, Student
+
+
+def _credentials(model, role: UserRole, priority: int) -> sa.Select:
+    return sa.select(
+        sa.cast(model.id, sa.String).label("id"),
+        sa.literal(role.value).label("role"),
+        model.password,
+        sa.literal(priority).label("priority"),
+    ).where(model.username == sa.bindparam("username"))
+
+
+# Login, params: username. Id, role and hash of every user with that
+# username in one round trip, students first as before.
+CREDENTIALS_BY_USERNAME = sa.union_all(
+    _credentials(Student, UserRole.STUDENT, 0),
+    _credentials(Instructor, UserRole.INSTRUCTOR, 1),
+    _credentials(Admin, UserRole.ADMIN, 2),
+).order_by(sa.literal_column("priority"))
+
+
+def _set_password(model) -> sa.Update:
+    # The id comes back as text from CREDENTIALS_BY_USERNAME
+    return (
+        sa.update(model)
+        .where(
+            model.id == sa.cast(sa.bindparam("user_id", type_=sa.String), model.id.type)
+        )
+        .values(password=sa.bindparam("new_password"))
+    )
+
+
+# Rehash on login, params: user_id, new_password
+SET_PASSWORD = {
+    UserRole.STUDENT: _set_password(Student),
+    UserRole.INSTRUCTOR: _set_password(Instructor),
+    UserRole.ADMIN: _set_password(Admin),
+}
+
+# Principal lookups of the auth dependencies, params: user_id
+STUDENT_BY_ID = sa.select(Student).where(Student.id == sa.bindparam("user_id"))
+INSTRUCTOR_BY_ID = sa.select(Instructor).where(Instructor.id == sa.bindparam("user_id"))
+ADMIN_BY_ID = sa.select(Admin).where(Admin.id == sa.bindparam("user_id"))
+
+# Reservation checks and writes
+# params: student_id
+STUDENT_SCHEDULE = (
+    sa.select(
+        ReservedCourse.course_id,
+        Course.unit,
+        CourseSection.day_of_week,
+        CourseSection.start_time,
+    )
+    .join(Course, Course.id == ReservedCourse.course_id)
+    .outerjoin(
+        CourseSectionToCourseAssociation,
+        CourseSectionToCourseAssociation.course_id == ReservedCourse.course_id,
+    )
+    .outerjoin(
+        CourseSection,
+        CourseSection.id == CourseSectionToCourseAssociation.course_section_id,
+    )
+    .where(ReservedCourse.student_id == sa.bindparam("student_id"))
+)
+# params: course_id
+COURSE_SLOTS = (
+    sa.select(Course, CourseSection.day_of_week, CourseSection.start_time)
+    .outerjoin(
+        CourseSectionToCourseAssociation,
+        CourseSectionToCourseAssociation.course_id == Course.id,
+    )
+    .outerjoin(
+        CourseSection,
+        CourseSection.id == CourseSectionToCourseAssociation.course_section_id,
+    )
+    .where(Course.id == sa.bindparam("course_id"))
+)
+# params: course_id. A single conditional UPDATE: the row lock it takes
+# serializes concurrent reservers of the course without a read-then-write race.
+TAKE_SEAT = (
+    sa.update(Course)
+    .where(Course.id == sa.bindparam("course_id"))
+    .where(
+        sa.or_(
+            Course.capacity.is_(None),
+            Course.reserved_count < Course.capacity,
+        )
+    )
+    .values(reserved_count=Course.reserved_count + 1)
+    .returning(Course.capacity, Course.reserved_count)
+    .execution_options(synchronize_session=False)
+)
+# params: course_id, student_id
+RESERVE_COURSE = sa.insert(ReservedCourse)
+
+
+def _catalog_page() -> sa.Select[int, str]:
+    # Every course becomes one json document built by Postgres, so a page is
+    # a single indexed range scan over course.id and Python only passes text
+    # along. The day enum is turned back into its DayOfWeek number.
+    day_of_week = (
+        sa.func.array_position(
+            sa.func.enum_range(sa.cast(sa.null(), CourseSection.day_of_week.type)),
+            CourseSection.day_of_week,
+        )
+        - 1
+    )
+    sections = (
+        sa.select(
+            sa.func.coalesce(
+                sa.func.json_agg(
+                    aggregate_order_by(
+                        sa.func.json_build_object(
+                            "id",
+                            CourseSection.id,
+                            "day_of_week",
+                            day_of_week,
+                            "start_time",
+                            CourseSection.start_time,
+                            "end_time",
+                            CourseSection.end_time,
+                        ),
+                        CourseSection.day_of_week,
+                        CourseSection.start_time,
+                    )
+                ),
+                sa.literal_column("'[]'::json"),
+            )
+        )
+        .select_from(CourseSectionToCourseAssociation)
+        .join(
+            CourseSection,
+            CourseSection.id == CourseSectionToCourseAssociation.course_section_id,
+        )
+        .where(CourseSectionToCourseAssociation.course_id == Course.id)
+        .scalar_subquery()
+    )
+    instructor = (
+        sa.select(
+            sa.func.json_build_object(
+                "id",
+                Instructor.id,
+                "first_name",
+                Instructor.first_name,
+                "last_name",
+                Instructor.last_name,
+                "national_id",
+                Instructor.national_id,
+                "email",
+                Instructor.email,
+                "username",
+                Instructor.username,
+                "phone_number",
+                Instructor.phone_number,
+                "birth_day",
+                Instructor.birth_day,
+                "available_sections",
+                sa.literal_column("'[]'::json"),
+            )
+        )
+        .select_from(CourseInstructor)
+        .join(Instructor, Instructor.id == CourseInstructor.instructor_id)
+        .where(CourseInstructor.course_id == Course.id)
+        .order_by(Instructor.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    document = sa.func.json_build_object(
+        "id",
+        Course.id,
+        "name",
+        Course.name,
+        "short_name",
+        Course.short_name,
+        "instructor",
+        instructor,
+        "sections_count",
+        Course.sections_count,
+        "unit",
+        Course.unit,
+        "importance",
+        Course.importance,
+        "capacity",
+        Course.capacity,
+        "sections",
+        sections,
+    )
+    return (
+        sa.select(Course.id, sa.cast(document, sa.Text))
+        .where(Course.id > sa.bindparam("after"))
+        .order_by(Course.id)
+        .limit(sa.bindparam("limit"))
+    )
+
+
+# Catalog page, params: after, limit
+CATALOG_PAGE = _catalog_page()
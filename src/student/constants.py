@@ -0,0 +1,15 @@
+MAX_RESERVED_UNITS = 20
+
+# Upper bounds of the in-process reservation caches (entries)
+SCHEDULE_CACHE_SIZE = 50_000
+COURSE_CACHE_SIZE = 10_000
+TICKETS_CACHE_SIZE = 100_000
+
+# Number of recent queue wait times kept for the percentiles
+QUEUE_WAIT_SAMPLES = 4096
+
+# Rows per multi-row INSERT of the bulk import (9 bind parameters each, asyncpg
+# allows 32767 per statement)
+IMPORT_BATCH_SIZE = 1000
+# Rejected rows listed in the import response, `failed` counts all of them
+IMPORT_MAX_ERRORS = 1000
@@ -3,26 +3,22 @@ from typing import Annotated
 
 import jwt
 import pydantic
-import sqlalchemy as sa
 from fastapi import Depends, HTTPException, status
 
-from src import config
-from src.authentication.constants import ALGORITHM
 from src.authentication.dependencies import BackendToken
-from src.authentication.schemas import TokenData
-from src.dependencies import SessionMaker
+from src.authentication.service import get_principal_cache
+from src.authentication.utils import decode_access_token
+from src.database import get_replica_router
+from src.dependencies import Session
+from src.invalidation import Change, sticky_key
 from src.schemas import UserRole
-from src.student.models import Student
+from src.statements import STUDENT_BY_ID
 from src.student.schemas import StudentSchema
 
 
-async def get_current_student(
-    maker: SessionMaker, token: BackendToken
-) -> StudentSchema:
+async def get_current_student(session: Session, token: BackendToken) -> StudentSchema:
     try:
-        algs = [ALGORITHM]
-        payload = jwt.decode(token, config.config.SECRET, algorithms=algs)
-        token_data = TokenData(**payload)
+        token_data = decode_access_token(token)
         if token_data.role != UserRole.STUDENT:
             raise jwt.InvalidTokenError()
         if datetime.datetime.fromtimestamp(token_data.exp) < datetime.datetime.now():
@@ -37,19 +33,25 @@ async def get_current_student(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    async with maker.begin() as session:
-        result = await session.execute(
-            sa.select(Student).where(Student.id == str(token_data.user_id))
+    # Right after their own change their reads go to the primary, the
+    # handler's too when the principal itself comes from the cache
+    get_replica_router().route(session, sticky_key(Change.STUDENT, token_data.user_id))
+    cache = get_principal_cache()
+    cached = cache.get(UserRole.STUDENT, token_data.user_id)
+    if isinstance(cached, StudentSchema):
+        return cached
+    result = await session.execute(STUDENT_BY_ID, {"user_id": str(token_data.user_id)})
+    user = result.scalar()
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Could not find user",
         )
-        user = result.scalar()
-
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Could not find user",
-            )
 
-        return StudentSchema.model_validate(user)
+    student = StudentSchema.model_validate(user)
+    cache.set(UserRole.STUDENT, token_data.user_id, student)
+    return student
 
 
 GetFullStudent = Annotated[StudentSchema, Depends(get_current_student)]
@@ -22,3 +22,39 @@ class StudentNotFound(BaseError):
 class AlreadyReserved(BaseError):
     code: Literal[ErrorCode.ALREADY_RESERVED] = ErrorCode.ALREADY_RESERVED
     details: Literal["course already reserved."] = "course already reserved."
+
+
+class TimeConflict(BaseError):
+    code: Literal[ErrorCode.TIME_CONFLICT] = ErrorCode.TIME_CONFLICT
+    details: Literal[
+        "course time conflicts with a reserved course."
+    ] = "course time conflicts with a reserved course."
+
+
+class UnitLimitExceeded(BaseError):
+    code: Literal[ErrorCode.UNIT_LIMIT_EXCEEDED] = ErrorCode.UNIT_LIMIT_EXCEEDED
+    details: Literal[
+        "reserved units would exceed the allowed limit."
+    ] = "reserved units would exceed the allowed limit."
+
+
+class ReservationQueueFull(BaseError):
+    code: Literal[ErrorCode.RESERVATION_QUEUE_FULL] = ErrorCode.RESERVATION_QUEUE_FULL
+    details: Literal[
+        "too many reservations in progress, try again."
+    ] = "too many reservations in progress, try again."
+
+
+class TicketNotFound(BaseError):
+    code: Literal[ErrorCode.TICKET_NOT_FOUND] = ErrorCode.TICKET_NOT_FOUND
+    details: Literal["reservation ticket not found."] = "reservation ticket not found."
+
+
+class InvalidImportRow(BaseError):
+    code: Literal[ErrorCode.INVALID_IMPORT_ROW] = ErrorCode.INVALID_IMPORT_ROW
+    details: str
+
+
+class InvalidImportFile(BaseError):
+    code: Literal[ErrorCode.INVALID_IMPORT_FILE] = ErrorCode.INVALID_IMPORT_FILE
+    details: str
@@ -0,0 +1,290 @@
+import asyncio
+import csv
+import json
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+
+import sqlalchemy as sa
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+
+from src.authentication.service import HashingExecutor
+from src.authentication.utils import hash_password
+from src.config import config
+from src.cutsom_types import HashedPassword
+from src.database import AsyncSession, async_sessionmaker
+from src.exceptions import GlobalException
+from src.metrics import executor_metrics
+from src.student.constants import IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS
+from src.student.exceptions import (
+    InvalidImportFile,
+    InvalidImportRow,
+    StudentDuplicate,
+)
+from src.student.models import Student
+from src.student.schemas import (
+    ImportFormat,
+    StudentImportError,
+    StudentRegisterData,
+    StudentsImported,
+)
+
+# Columns a new student can collide on, in the order they are reported
+UNIQUE_FIELDS = ("id", "national_id", "email", "username", "phone_number")
+
+
+def hash_passwords(raw_passwords: List[str]) -> List[HashedPassword]:
+    # Module level so that a process hashing executor can run it
+    return [hash_password(raw) for raw in raw_passwords]
+
+
+def decode_line(line: bytes, number: int) -> str:
+    try:
+        return line.decode().rstrip("\r")
+    except UnicodeDecodeError:
+        raise GlobalException(
+            InvalidImportFile(details=f"line {number} is not valid UTF-8"),
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    rest = b""
+    number = 0
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            number += 1
+            yield decode_line(line, number)
+    if rest:
+        yield decode_line(rest, number + 1)
+
+
+async def iter_rows(
+    chunks: AsyncIterator[bytes], format: ImportFormat
+) -> AsyncIterator[Tuple[int, dict | InvalidImportRow]]:
+    # One record per line in both formats, so a quoted CSV value can not
+    # span lines. Yields the line number with the parsed record or the error.
+    header: List[str] | None = None
+    number = 0
+    async for line in iter_lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+        if format == ImportFormat.NDJSON:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as ex:
+                yield number, InvalidImportRow(details=str(ex))
+                continue
+            if not isinstance(record, dict):
+                yield number, InvalidImportRow(details="row is not an object")
+                continue
+            yield number, record
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                yield number, InvalidImportRow(
+                    details=f"expected {len(header)} values, got {len(values)}"
+                )
+            else:
+                yield number, dict(zip(header, values))
+
+
+class StudentImporter:
+    # Validates a stream of rows, hashes the initial passwords of a batch on
+    # a process executor, one chunk per worker, and writes it with one
+    # multi-row INSERT while the next batch is being hashed. Rows that
+    # collide with existing students or with each other are reported, the
+    # rest of their batch still goes in. A file that is not UTF-8 stops the
+    # import with a 400 at its first bad line, batches written before stay.
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        executor: HashingExecutor,
+        batch_size: int = IMPORT_BATCH_SIZE,
+    ):
+        self.session_maker = session_maker
+        self.executor = executor
+        self.batch_size = batch_size
+
+    async def run(
+        self, rows: AsyncIterator[Tuple[int, dict | InvalidImportRow]]
+    ) -> StudentsImported:
+        result = StudentsImported(imported=0, failed=0, errors=[])
+        batch: List[Tuple[int, StudentRegisterData]] = []
+        writing: asyncio.Task | None = None
+
+        async def flush():
+            nonlocal writing, batch
+            passwords = await self._hash([row for _, row in batch])
+            if writing is not None:
+                await writing
+            writing = asyncio.create_task(self._write(batch, passwords, result))
+            batch = []
+
+        try:
+            async for line, record in rows:
+                if isinstance(record, InvalidImportRow):
+                    self._fail(result, line, None, record)
+                    continue
+                try:
+                    batch.append((line, StudentRegisterData.model_validate(record)))
+                except ValidationError as ex:
+                    self._fail(
+                        result,
+                        line,
+                        _student_id(record),
+                        InvalidImportRow(details=_describe(ex)),
+                    )
+                    continue
+                if len(batch) >= self.batch_size:
+                    await flush()
+            if batch:
+                await flush()
+            if writing is not None:
+                await writing
+        finally:
+            # A failed read or hash leaves the last write running
+            if writing is not None and not writing.done():
+                writing.cancel()
+                await asyncio.gather(writing, return_exceptions=True)
+
+        result.errors.sort(key=lambda error: error.line)
+        return result
+
+    async def _hash(self, rows: List[StudentRegisterData]) -> List[HashedPassword]:
+        raw = [row.national_id for row in rows]
+        size = -(-len(raw) // self.executor.workers)
+        parts = await asyncio.gather(
+            *(
+                self.executor.run(hash_passwords, raw[i : i + size])
+                for i in range(0, len(raw), size)
+            )
+        )
+        return [password for part in parts for password in part]
+
+    async def _write(
+        self,
+        batch: List[Tuple[int, StudentRegisterData]],
+        passwords: List[HashedPassword],
+        result: StudentsImported,
+    ):
+        # Rows clashing with an earlier row of the same batch never reach the
+        # INSERT, so the ids it returns identify the rejected rows exactly.
+        seen: Dict[str, Set[str]] = {field: set() for field in UNIQUE_FIELDS}
+        values: List[Tuple[int, dict]] = []
+        for (line, row), password in zip(batch, passwords):
+            value: Dict[str, Any] = {
+                "id": row.student_id,
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "national_id": row.national_id,
+                "email": row.email,
+                "username": row.student_id,
+                "phone_number": row.phone_number,
+                "birth_day": row.birth_day,
+                "password": password,
+            }
+            clashes = [field for field in UNIQUE_FIELDS if value[field] in seen[field]]
+            if clashes:
+                self._fail(
+                    result,
+                    line,
+                    row.student_id,
+                    StudentDuplicate(duplicate_fields=clashes),
+                )
+                continue
+            for field in UNIQUE_FIELDS:
+                seen[field].add(value[field])
+            values.append((line, value))
+        if not values:
+            return
+
+        existing: Dict[str, Set[str]] = {}
+        async with self.session_maker.begin() as session:
+            inserted: Set[str] = set(
+                (
+                    await session.execute(
+                        insert(Student)
+                        .values([value for _, value in values])
+                        .on_conflict_do_nothing()
+                        .returning(Student.id)
+                    )
+                ).scalars()
+            )
+            rejected = [
+                (line, value) for line, value in values if value["id"] not in inserted
+            ]
+            if rejected:
+                existing = await self._existing(session, [v for _, v in rejected])
+
+        result.imported += len(inserted)
+        for line, value in rejected:
+            clashes = [
+                field for field in UNIQUE_FIELDS if value[field] in existing[field]
+            ]
+            self._fail(
+                result, line, value["id"], StudentDuplicate(duplicate_fields=clashes)
+            )
+
+    async def _existing(
+        self, session: AsyncSession, values: List[dict]
+    ) -> Dict[str, Set[str]]:
+        columns = [getattr(Student, field) for field in UNIQUE_FIELDS]
+        rows = await session.execute(
+            sa.select(*columns).where(
+                sa.or_(
+                    *(
+                        column.in_({value[field] for value in values})
+                        for field, column in zip(UNIQUE_FIELDS, columns)
+                    )
+                )
+            )
+        )
+        existing: Dict[str, Set[str]] = {field: set() for field in UNIQUE_FIELDS}
+        for row in rows:
+            for field, value in zip(UNIQUE_FIELDS, row):
+                existing[field].add(value)
+        return existing
+
+    @staticmethod
+    def _fail(
+        result: StudentsImported,
+        line: int,
+        student_id: str | None,
+        error: StudentDuplicate | InvalidImportRow,
+    ):
+        result.failed += 1
+        if len(result.errors) < IMPORT_MAX_ERRORS:
+            result.errors.append(
+                StudentImportError(line=line, student_id=student_id, error=error)
+            )
+
+
+@lru_cache()
+def get_import_executor() -> HashingExecutor:
+    # Its own pool, so an import never queues logins behind its hashing
+    executor = HashingExecutor(
+        "process", config.STUDENT_IMPORT_WORKERS, config.STUDENT_IMPORT_WORKERS
+    )
+    executor_metrics(
+        "student_import", lambda: executor.pending, lambda: executor.queue_depth
+    )
+    return executor
+
+
+def _describe(ex: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in ex.errors()
+    )
+
+
+def _student_id(record: dict) -> str | None:
+    student_id = record.get("student_id")
+    return None if student_id is None else str(student_id)
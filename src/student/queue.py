@@ -0,0 +1,290 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List
+
+import sqlalchemy as sa
+from fastapi import status
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from src.config import config
+from src.course.exceptions import CourseFull, CourseNotFound
+from src.course.models import Course
+from src.cutsom_types import StudnentID
+from src.database import AsyncSession, async_sessionmaker, get_session_maker
+from src.exceptions import GlobalException, UnknownError
+from src.invalidation import Change, publish
+from src.schemas import BaseError
+from src.student.constants import QUEUE_WAIT_SAMPLES, TICKETS_CACHE_SIZE
+from src.student.exceptions import (
+    AlreadyReserved,
+    ReservationQueueFull,
+    StudentNotFound,
+)
+from src.student.models import ReservedCourse
+from src.student.schemas import ReservationQueueStats, TicketStatus
+
+
+class ReservationTicket:
+    __slots__ = ("course_id", "enqueued_at", "future", "id", "student_id")
+
+    def __init__(self, student_id: StudnentID, course_id: int):
+        self.id = uuid.uuid4().hex
+        self.student_id = student_id
+        self.course_id = course_id
+        # Resolves to None once reserved or to the error explaining why not
+        self.future: asyncio.Future[
+            BaseError | None
+        ] = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+    @property
+    def error(self) -> BaseError | None:
+        if not self.future.done():
+            return None
+        if self.future.exception() is not None:
+            return UnknownError()
+        return self.future.result()
+
+    @property
+    def status(self) -> TicketStatus:
+        if not self.future.done():
+            return TicketStatus.PENDING
+        if self.error is not None:
+            return TicketStatus.FAILED
+        return TicketStatus.RESERVED
+
+
+def _resolve(ticket: ReservationTicket, error: BaseError | None):
+    if not ticket.future.done():
+        ticket.future.set_result(error)
+
+
+class ReservationQueue:
+    # Reservations are admitted into a bounded queue and written by a fixed
+    # number of workers, so a registration burst uses at most `workers` pool
+    # connections and every worker turns what it drained into one multi-row
+    # INSERT per course.
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        size: int,
+        workers: int,
+        batch_size: int,
+        batch_wait: float,
+    ):
+        self.session_maker = session_maker
+        self.size = size
+        self.workers_count = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue: asyncio.Queue[ReservationTicket] | None = None
+        self.workers: List[asyncio.Task] = []
+        self.tickets: Dict[str, ReservationTicket] = {}
+        self.waits: Deque[float] = deque(maxlen=QUEUE_WAIT_SAMPLES)
+        self.processed = 0
+        self.closing = False
+
+    def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.size)
+            self.workers = [
+                asyncio.create_task(self._work()) for _ in range(self.workers_count)
+            ]
+
+    async def stop(self, drain_seconds: float = 0):
+        # Admits nothing more and gives the workers `drain_seconds` to write
+        # what is already queued. Tickets still queued after that fail with
+        # ReservationQueueFull, so their clients can retry on another worker.
+        self.closing = True
+        if self.queue is not None and drain_seconds > 0:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_seconds)
+            except TimeoutError:
+                pass
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        if self.queue is not None:
+            while not self.queue.empty():
+                _resolve(self.queue.get_nowait(), ReservationQueueFull())
+        self.workers = []
+        self.queue = None
+
+    def submit(self, student_id: StudnentID, course_id: int) -> ReservationTicket:
+        if self.closing:
+            raise GlobalException(
+                ReservationQueueFull(), status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        self.start()
+        assert self.queue is not None
+        ticket = ReservationTicket(student_id, course_id)
+        try:
+            self.queue.put_nowait(ticket)
+        except asyncio.QueueFull:
+            raise GlobalException(
+                ReservationQueueFull(), status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if len(self.tickets) >= TICKETS_CACHE_SIZE:
+            del self.tickets[next(iter(self.tickets))]
+        self.tickets[ticket.id] = ticket
+        return ticket
+
+    def get_ticket(self, ticket_id: str) -> ReservationTicket | None:
+        return self.tickets.get(ticket_id)
+
+    def stats(self) -> ReservationQueueStats:
+        waits = sorted(self.waits)
+        return ReservationQueueStats(
+            depth=self.queue.qsize() if self.queue is not None else 0,
+            workers=len(self.workers),
+            processed=self.processed,
+            wait_p50=waits[len(waits) // 2] if waits else 0.0,
+            wait_p99=waits[int(len(waits) * 0.99)] if waits else 0.0,
+            wait_max=waits[-1] if waits else 0.0,
+        )
+
+    async def _next_batch(self) -> List[ReservationTicket]:
+        assert self.queue is not None
+        batch = [await self.queue.get()]
+        if self.queue.qsize() < self.batch_size - 1:
+            # Give a forming burst a moment to pile up behind the first request
+            await asyncio.sleep(self.batch_wait)
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _work(self):
+        assert self.queue is not None
+        while True:
+            batch = await self._next_batch()
+            now = time.perf_counter()
+            self.waits.extend(now - ticket.enqueued_at for ticket in batch)
+            try:
+                try:
+                    await self._insert(batch)
+                except IntegrityError:
+                    # A course or student went away in the middle of the batch;
+                    # retry one by one so only the affected tickets fail.
+                    for ticket in batch:
+                        await self._insert([ticket])
+            except Exception as ex:
+                for ticket in batch:
+                    if not ticket.future.done():
+                        ticket.future.set_exception(ex)
+            except asyncio.CancelledError:
+                # Stopped mid-batch: whether the batch committed is unknown
+                for ticket in batch:
+                    if not ticket.future.done():
+                        ticket.future.set_exception(
+                            RuntimeError("reservation queue stopped")
+                        )
+                raise
+            finally:
+                self.processed += len(batch)
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _insert(self, batch: List[ReservationTicket]):
+        by_course: Dict[int, Dict[StudnentID, ReservationTicket]] = {}
+        results: Dict[ReservationTicket, BaseError | None] = {}
+        for ticket in batch:
+            if ticket.future.done():
+                continue
+            tickets = by_course.setdefault(ticket.course_id, {})
+            if ticket.student_id in tickets:
+                results[ticket] = AlreadyReserved()
+            else:
+                tickets[ticket.student_id] = ticket
+
+        try:
+            async with self.session_maker.begin() as session:
+                for course_id, tickets in by_course.items():
+                    await self._insert_course(session, course_id, tickets, results)
+                reserved = [
+                    ticket.student_id
+                    for ticket, error in results.items()
+                    if error is None
+                ]
+                if reserved:
+                    await publish(session, Change.STUDENT, *reserved)
+        except IntegrityError:
+            if len(batch) > 1:
+                raise
+            results = {batch[0]: StudentNotFound()}
+
+        for ticket, error in results.items():
+            _resolve(ticket, error)
+
+    async def _insert_course(
+        self,
+        session: AsyncSession,
+        course_id: int,
+        tickets: Dict[StudnentID, ReservationTicket],
+        results: Dict[ReservationTicket, BaseError | None],
+    ):
+        # One row lock per course and batch instead of one per reservation
+        row = (
+            await session.execute(
+                sa.select(Course.capacity, Course.reserved_count)
+                .where(Course.id == course_id)
+                .with_for_update()
+            )
+        ).one_or_none()
+        if row is None:
+            results.update((ticket, CourseNotFound()) for ticket in tickets.values())
+            return
+        capacity, reserved_count = row
+        free = None if capacity is None else max(capacity - reserved_count, 0)
+
+        # Students that already hold the course do not use a seat, so keep
+        # filling with the next ones in queue order until seats run out.
+        pending = list(tickets)
+        taken = 0
+        while pending and (free is None or free > 0):
+            chunk, pending = (
+                (pending, []) if free is None else (pending[:free], pending[free:])
+            )
+            rows = await session.execute(
+                insert(ReservedCourse)
+                .values(
+                    [
+                        {"course_id": course_id, "student_id": student_id}
+                        for student_id in chunk
+                    ]
+                )
+                .on_conflict_do_nothing()
+                .returning(ReservedCourse.student_id)
+            )
+            inserted = set(rows.scalars())
+            for student_id in chunk:
+                results[tickets[student_id]] = (
+                    None if student_id in inserted else AlreadyReserved()
+                )
+            taken += len(inserted)
+            if free is not None:
+                free -= len(inserted)
+        for student_id in pending:
+            results[tickets[student_id]] = CourseFull()
+
+        if taken:
+            await session.execute(
+                sa.update(Course)
+                .where(Course.id == course_id)
+                .values(reserved_count=Course.reserved_count + taken)
+                .execution_options(synchronize_session=False)
+            )
+
+
+@lru_cache()
+def get_reservation_queue() -> ReservationQueue:
+    return ReservationQueue(
+        get_session_maker(),
+        size=config.RESERVATION_QUEUE_SIZE,
+        workers=config.RESERVATION_QUEUE_WORKERS,
+        batch_size=config.RESERVATION_BATCH_SIZE,
+        batch_wait=config.RESERVATION_BATCH_WAIT_MS / 1000,
+    )
@@ -1,44 +1,68 @@
+import asyncio
+
 import sqlalchemy as sa
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from src.authentication.dependencies import GetFullAdmin
-from src.authentication.utils import hash_password, to_async
-from src.course.exceptions import CourseNotFound
+from src.authentication.service import get_principal_cache
+from src.authentication.utils import hash_password_async
+from src.config import config
+from src.course.exceptions import CourseFull, CourseNotFound
 from src.course.models import Course
 from src.course.schemas import (
-    CourseInfoSchema,
     CourseReserved,
     CourseUnreserved,
     ReserveCourseIn,
     UnReservedCourseIn,
 )
-from src.database import get_session_maker
-from src.dependencies import SessionMaker
+from src.cutsom_types import StudnentID
+from src.database import transaction
+from src.dependencies import Session, SessionMaker
 from src.exceptions import GlobalException
+from src.invalidation import Change, publish
+from src.schemas import UserRole
+from src.statements import RESERVE_COURSE
 from src.student.dependencies import GetFullStudent
-from src.student.exceptions import AlreadyReserved, StudentDuplicate, StudentNotFound
+from src.student.exceptions import (
+    AlreadyReserved,
+    ReservationQueueFull,
+    StudentDuplicate,
+    StudentNotFound,
+    TicketNotFound,
+    TimeConflict,
+    UnitLimitExceeded,
+)
+from src.student.importer import StudentImporter, get_import_executor, iter_rows
 from src.student.models import ReservedCourse, Student
+from src.student.queue import get_reservation_queue
 from src.student.schemas import (
     AllReservedCourseOut,
     AllStudentsOut,
+    ImportFormat,
+    ReservationQueued,
+    ReservationQueueStats,
+    ReservationTicketOut,
     ReservedCourseOut,
     StudentAdded,
     StudentDeleted,
     StudentDeleteIn,
     StudentRegisterData,
     StudentSchema,
+    StudentsImported,
     UpdateStudentIn,
 )
+from src.student.service import CourseSlots, get_reservation_service
 
 router = APIRouter(prefix="/student", tags=["Student"])
 
 
 @router.post("/new-student", response_model=StudentAdded, tags=["ByAdmin"])
 async def create_new_student(
-    register_data: StudentRegisterData, maker: SessionMaker, _: GetFullAdmin
+    register_data: StudentRegisterData, session: Session, _: GetFullAdmin
 ):
-    async with maker.begin() as session:
+    async with transaction(session):
         try:
             student = await session.execute(
                 sa.insert(Student)
@@ -52,8 +76,8 @@ async def create_new_student(
                         "username": register_data.student_id,
                         "phone_number": register_data.phone_number,
                         "birth_day": register_data.birth_day,
-                        "password": await to_async(
-                            hash_password, register_data.national_id
+                        "password": await hash_password_async(
+                            register_data.national_id
                         ),
                     }
                 )
@@ -86,24 +110,44 @@ async def create_new_student(
             return StudentAdded(student=StudentSchema.model_validate(student))
 
 
+@router.post("/import", tags=["ByAdmin"])
+async def import_students(
+    request: Request,
+    maker: SessionMaker,
+    _: GetFullAdmin,
+    format: ImportFormat = Query(ImportFormat.CSV),
+) -> StudentsImported:
+    # The body is the raw file (a header line and then one student per line
+    # for CSV, one object per line for NDJSON), read as it arrives.
+    importer = StudentImporter(maker, get_import_executor())
+    return await importer.run(iter_rows(request.stream(), format))
+
+
 @router.post("/delete-student")
 async def delete_student(
-    data: StudentDeleteIn, maker: SessionMaker, _: GetFullAdmin
+    data: StudentDeleteIn, session: Session, _: GetFullAdmin
 ) -> StudentDeleted:
-    async with maker.begin() as session:
+    async with transaction(session):
         stu = await session.execute(
             sa.select(Student).where(Student.id == data.student_id)
         )
         stu = stu.scalar()
         if stu is not None:
-            await session.execute(
-                sa.delete(ReservedCourse).where(
-                    ReservedCourse.student_id == data.student_id
-                )
+            service = get_reservation_service()
+            released = await session.execute(
+                sa.delete(ReservedCourse)
+                .where(ReservedCourse.student_id == data.student_id)
+                .returning(ReservedCourse.course_id)
             )
+            await service.release_seats(session, released.scalars())
             await session.execute(
                 sa.delete(Student).where(Student.id == data.student_id)
             )
+            service.invalidate_student_on_commit(session, data.student_id)
+            get_principal_cache().invalidate_on_commit(
+                session, UserRole.STUDENT, data.student_id
+            )
+            await publish(session, Change.STUDENT, data.student_id)
             return StudentDeleted(
                 student=StudentSchema.model_validate(stu),
             )
@@ -111,37 +155,130 @@ async def delete_student(
             raise GlobalException(StudentNotFound(), status.HTTP_400_BAD_REQUEST)
 
 
+async def _check_reservation(
+    session: AsyncSession, student_id: StudnentID, course_id: int
+) -> CourseSlots:
+    # On a warm cache this runs no query at all: the session never checks out
+    # a connection.
+    service = get_reservation_service()
+    async with transaction(session):
+        summary = await service.get_summary(session, student_id)
+        course = await service.get_course(session, course_id)
+        await service.reconcile_seats(session)
+    if course is None:
+        raise GlobalException(CourseNotFound(), status.HTTP_400_BAD_REQUEST)
+    if service.is_full(course_id):
+        raise GlobalException(CourseFull(), status.HTTP_400_BAD_REQUEST)
+    error = summary.check(course)
+    if error is not None:
+        raise GlobalException(error, status.HTTP_400_BAD_REQUEST)
+
+    # Take the slots before inserting so a parallel request of the same
+    # student is checked against them.
+    summary.add(course)
+    return course
+
+
 @router.post(
     "/reserve-course",
-    responses={400: {"model": CourseNotFound | AlreadyReserved}},
+    responses={
+        400: {
+            "model": CourseNotFound
+            | CourseFull
+            | AlreadyReserved
+            | TimeConflict
+            | UnitLimitExceeded
+        },
+        503: {"model": ReservationQueueFull},
+    },
 )
 async def reserve_course(
-    data: ReserveCourseIn, student: GetFullStudent
+    data: ReserveCourseIn, student: GetFullStudent, session: Session
 ) -> CourseReserved:
-    async with get_session_maker().begin() as session:
-        student_id = student.id
-        check_exists_q = (
-            sa.select(ReservedCourse)
-            .filter(ReservedCourse.course_id == data.course_id)
-            .filter(ReservedCourse.student_id == student_id)
-        )
-        check_res = (await session.execute(check_exists_q)).scalar()
-        if check_res is not None:
-            raise GlobalException(AlreadyReserved(), status.HTTP_400_BAD_REQUEST)
-        check_result = await session.execute(
-            sa.select(Course).where(Course.id == data.course_id)
-        )
-        course = check_result.scalar()
-        if course is None:
-            raise GlobalException(CourseNotFound(), status.HTTP_400_BAD_REQUEST)
-        query = sa.insert(ReservedCourse).values(
-            {
-                ReservedCourse.course_id: data.course_id,
-                ReservedCourse.student_id: student_id,
-            }
-        )
-        await session.execute(query)
-        return CourseReserved(course=CourseInfoSchema.model_validate(course))
+    service = get_reservation_service()
+    course = await _check_reservation(session, student.id, data.course_id)
+    try:
+        if config.RESERVATION_QUEUE_ENABLED:
+            ticket = get_reservation_queue().submit(student.id, data.course_id)
+            error = await asyncio.shield(ticket.future)
+            if error is not None:
+                raise GlobalException(error, status.HTTP_400_BAD_REQUEST)
+        else:
+            async with transaction(session):
+                # The seat is taken first and rolled back with the transaction
+                # if the insert fails.
+                if not await service.take_seat(session, data.course_id):
+                    raise GlobalException(CourseFull(), status.HTTP_400_BAD_REQUEST)
+                await session.execute(
+                    RESERVE_COURSE,
+                    {"course_id": data.course_id, "student_id": student.id},
+                )
+                await publish(session, Change.STUDENT, student.id)
+    except IntegrityError:
+        # Already rolled back, so only the slots _check_reservation took for
+        # this request are dropped
+        service.invalidate_student(student.id)
+        raise GlobalException(AlreadyReserved(), status.HTTP_400_BAD_REQUEST)
+    except BaseException:
+        service.invalidate_student(student.id)
+        raise
+    return CourseReserved(course=course.info)
+
+
+@router.post(
+    "/reserve-course/queued",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        400: {
+            "model": CourseNotFound
+            | CourseFull
+            | AlreadyReserved
+            | TimeConflict
+            | UnitLimitExceeded
+        },
+        503: {"model": ReservationQueueFull},
+    },
+)
+async def reserve_course_queued(
+    data: ReserveCourseIn, student: GetFullStudent, session: Session
+) -> ReservationQueued:
+    service = get_reservation_service()
+    await _check_reservation(session, student.id, data.course_id)
+    try:
+        ticket = get_reservation_queue().submit(student.id, data.course_id)
+    except BaseException:
+        service.invalidate_student(student.id)
+        raise
+
+    def done(_: asyncio.Future):
+        if ticket.error is not None:
+            service.invalidate_student(student.id)
+
+    ticket.future.add_done_callback(done)
+    return ReservationQueued(ticket=ticket.id)
+
+
+@router.get(
+    "/reservation/{ticket_id}",
+    responses={404: {"model": TicketNotFound}},
+)
+async def get_reservation_ticket(
+    ticket_id: str, student: GetFullStudent
+) -> ReservationTicketOut:
+    ticket = get_reservation_queue().get_ticket(ticket_id)
+    if ticket is None or ticket.student_id != student.id:
+        raise GlobalException(TicketNotFound(), status.HTTP_404_NOT_FOUND)
+    return ReservationTicketOut(
+        ticket=ticket.id,
+        course_id=ticket.course_id,
+        status=ticket.status,
+        error=ticket.error,
+    )
+
+
+@router.get("/reservation-queue", tags=["ByAdmin"])
+async def reservation_queue_stats(_: GetFullAdmin) -> ReservationQueueStats:
+    return get_reservation_queue().stats()
 
 
 @router.delete(
@@ -149,9 +286,9 @@ async def reserve_course(
     responses={400: {"model": CourseNotFound}},
 )
 async def unreserve_course(
-    data: UnReservedCourseIn, student: GetFullStudent, maker: SessionMaker
+    data: UnReservedCourseIn, student: GetFullStudent, session: Session
 ) -> CourseUnreserved:
-    async with maker.begin() as session:
+    async with transaction(session):
         check_result = await session.execute(
             sa.select(Course).where(Course.id == data.course_id)
         )
@@ -164,9 +301,14 @@ async def unreserve_course(
             sa.delete(ReservedCourse)
             .where(ReservedCourse.student_id == student.id)
             .where(ReservedCourse.course_id == data.course_id)
+            .returning(ReservedCourse.course_id)
         )
 
-        await session.execute(query)
+        released = await session.execute(query)
+        service = get_reservation_service()
+        await service.release_seats(session, released.scalars())
+        service.invalidate_student_on_commit(session, student.id)
+        await publish(session, Change.STUDENT, student.id)
 
         return CourseUnreserved(
             name=course.name,
@@ -178,9 +320,9 @@ async def unreserve_course(
 
 @router.get("/reserved-course")
 async def get_reserved_course(
-    student: GetFullStudent, maker: SessionMaker
+    student: GetFullStudent, session: Session
 ) -> AllReservedCourseOut:
-    async with maker.begin() as session:
+    async with transaction(session):
         student_id = student.id
         query = (
             sa.select(Course.name, Course.unit)
@@ -200,11 +342,11 @@ async def get_reserved_course(
 @router.get("/all")
 async def get_all_students(
     _: GetFullAdmin,
-    maker: SessionMaker,
+    session: Session,
     limit: int = Query(gt=0, default=10, lt=25),
     offset: int = Query(gt=-1, default=0),
 ) -> AllStudentsOut:
-    async with maker.begin() as session:
+    async with transaction(session):
         query = sa.select(Student).limit(limit=limit).offset(offset=offset)
 
         res = (await session.execute(query)).scalars()
@@ -216,9 +358,9 @@ async def get_all_students(
 
 @router.put("/update-student/{student_id}")
 async def update_student(
-    student: GetFullAdmin, data: UpdateStudentIn, maker: SessionMaker, student_id
+    student: GetFullAdmin, data: UpdateStudentIn, session: Session, student_id
 ):
-    async with maker.begin() as session:
+    async with transaction(session):
         check_student = await session.execute(
             sa.select(Student).where(Student.id == student_id)
         )
@@ -243,5 +385,9 @@ async def update_student(
         query = sa.update(Student).where(Student.id == student_id).values(**UpdateData)
 
         await session.execute(query)
+        get_principal_cache().invalidate_on_commit(
+            session, UserRole.STUDENT, student_id
+        )
+        await publish(session, Change.STUDENT, student_id)
 
         return {"message": "Student updated successfully", "updated_fields": UpdateData}
@@ -1,10 +1,12 @@
 import datetime
-from typing import Literal, Optional
+import enum
+from typing import Literal, Optional, Union
 
 from pydantic import BaseModel, EmailStr
 
 from src.cutsom_types import StudnentID
 from src.schemas import (
+    BaseError,
     Messages,
     ObjectAdded,
     ObjectDeleted,
@@ -12,6 +14,7 @@ from src.schemas import (
     UserFullInfo,
     UserRegisterData,
 )
+from src.student.exceptions import InvalidImportRow, StudentDuplicate
 
 
 class UpdateStudentIn(BaseModel):
@@ -41,7 +44,7 @@ class StudentDeleteIn(BaseModel):
 
 
 class StudentSchema(BaseModel):
-    id: str
+    id: StudnentID
     first_name: str
     last_name: str
     national_id: str
@@ -82,3 +85,49 @@ class StudentDeleted(ObjectDeleted):
 class AllStudentsOut(BaseModel):
     students: list[StudentSchema]
     count: int
+
+
+class TicketStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RESERVED = "RESERVED"
+    FAILED = "FAILED"
+
+
+class ReservationQueued(BaseModel):
+    code: Literal[SuccessCodes.RESERVATION_QUEUED] = SuccessCodes.RESERVATION_QUEUED
+    ticket: str
+
+
+class ReservationTicketOut(BaseModel):
+    ticket: str
+    course_id: int
+    status: TicketStatus
+    error: Optional[BaseError] = None
+
+
+class ReservationQueueStats(BaseModel):
+    depth: int
+    workers: int
+    processed: int
+    wait_p50: float
+    wait_p99: float
+    wait_max: float
+
+
+class ImportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class StudentImportError(BaseModel):
+    line: int
+    student_id: Optional[str] = None
+    error: Union[StudentDuplicate, InvalidImportRow]
+
+
+class StudentsImported(BaseModel):
+    code: Literal[SuccessCodes.STUDENTS_IMPORTED] = SuccessCodes.STUDENTS_IMPORTED
+    message: Literal[Messages.STUDENTS_IMPORTED] = Messages.STUDENTS_IMPORTED
+    imported: int
+    failed: int
+    errors: list[StudentImportError]
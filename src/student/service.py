@@ -0,0 +1,191 @@
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Set
+
+import sqlalchemy as sa
+
+from src.config import config
+from src.course.models import Course
+from src.course.schemas import CourseInfoSchema, WeekMask, slot_mask
+from src.cutsom_types import StudnentID
+from src.database import AsyncSession, async_sessionmaker, get_session_maker
+from src.schemas import BaseError
+from src.statements import COURSE_SLOTS, STUDENT_SCHEDULE, TAKE_SEAT
+from src.student.constants import (
+    COURSE_CACHE_SIZE,
+    MAX_RESERVED_UNITS,
+    SCHEDULE_CACHE_SIZE,
+)
+from src.student.exceptions import AlreadyReserved, TimeConflict, UnitLimitExceeded
+
+
+class CourseSlots:
+    __slots__ = ("id", "info", "mask", "unit")
+
+    def __init__(self, id: int, unit: int, mask: WeekMask, info: CourseInfoSchema):
+        self.id = id
+        self.unit = unit
+        self.mask = mask
+        self.info = info
+
+
+class ScheduleSummary:
+    __slots__ = ("course_ids", "mask", "units")
+
+    def __init__(self, course_ids: Set[int], mask: int, units: int):
+        self.course_ids = course_ids
+        self.mask = mask
+        self.units = units
+
+    def check(self, course: CourseSlots) -> BaseError | None:
+        if course.id in self.course_ids:
+            return AlreadyReserved()
+        if self.mask & course.mask:
+            return TimeConflict()
+        if self.units + course.unit > MAX_RESERVED_UNITS:
+            return UnitLimitExceeded()
+        return None
+
+    def add(self, course: CourseSlots):
+        self.course_ids.add(course.id)
+        self.mask |= course.mask
+        self.units += course.unit
+
+
+def _evict(cache: dict, size: int):
+    # dicts keep insertion order, so the first key is the oldest entry
+    if len(cache) >= size:
+        del cache[next(iter(cache))]
+
+
+class ReservationService:
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+        self.session_maker = session_maker
+        self.summaries: Dict[StudnentID, ScheduleSummary] = {}
+        self.courses: Dict[int, CourseSlots] = {}
+        # Free seats of courses with a capacity. Only used to turn away requests
+        # for full courses early, the conditional UPDATE in take_seat decides.
+        self.seats: Dict[int, int] = {}
+        self.seats_loaded_at = 0.0
+
+    async def get_summary(
+        self, session: AsyncSession, student_id: StudnentID
+    ) -> ScheduleSummary:
+        summary = self.summaries.get(student_id)
+        if summary is not None:
+            return summary
+
+        rows = await session.execute(STUDENT_SCHEDULE, {"student_id": student_id})
+        summary = ScheduleSummary(set(), 0, 0)
+        for course_id, unit, day, start in rows:
+            if course_id not in summary.course_ids:
+                summary.course_ids.add(course_id)
+                summary.units += unit
+            if day is not None:
+                summary.mask |= slot_mask(day, start)
+
+        _evict(self.summaries, SCHEDULE_CACHE_SIZE)
+        self.summaries[student_id] = summary
+        return summary
+
+    async def get_course(
+        self, session: AsyncSession, course_id: int
+    ) -> CourseSlots | None:
+        course = self.courses.get(course_id)
+        if course is not None:
+            return course
+
+        rows = (await session.execute(COURSE_SLOTS, {"course_id": course_id})).all()
+        if not rows:
+            return None
+
+        mask = 0
+        for _, day, start in rows:
+            if day is not None:
+                mask |= slot_mask(day, start)
+        row = rows[0][0]
+        course = CourseSlots(
+            row.id, row.unit, WeekMask(mask), CourseInfoSchema.model_validate(row)
+        )
+
+        _evict(self.courses, COURSE_CACHE_SIZE)
+        self.courses[course_id] = course
+        return course
+
+    def is_full(self, course_id: int) -> bool:
+        return self.seats.get(course_id, 1) <= 0
+
+    async def reconcile_seats(self, session: AsyncSession):
+        interval = config.SEAT_CACHE_RECONCILE_SECONDS
+        if interval <= 0 or time.monotonic() - self.seats_loaded_at < interval:
+            return
+        self.seats_loaded_at = time.monotonic()
+        # Only courses with a capacity, so the free seats are never NULL
+        free = sa.type_coerce(Course.capacity - Course.reserved_count, sa.Integer)
+        rows = await session.execute(
+            sa.select(Course.id, free).where(Course.capacity.is_not(None))
+        )
+        self.seats = {course_id: free for course_id, free in rows}
+
+    async def take_seat(self, session: AsyncSession, course_id: int) -> bool:
+        row = (await session.execute(TAKE_SEAT, {"course_id": course_id})).one_or_none()
+        if row is None:
+            self.seats[course_id] = 0
+            return False
+        capacity, reserved_count = row
+        if capacity is not None:
+            # Only once the seat is really taken, a rollback leaves it free
+            self._after_commit(
+                session, lambda: self._set_seats(course_id, capacity - reserved_count)
+            )
+        return True
+
+    def _set_seats(self, course_id: int, free: int):
+        self.seats[course_id] = free
+
+    async def release_seats(self, session: AsyncSession, course_ids: Iterable[int]):
+        course_ids = list(course_ids)
+        if not course_ids:
+            return
+        await session.execute(
+            sa.update(Course)
+            .where(Course.id.in_(course_ids))
+            .values(reserved_count=Course.reserved_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        self._after_commit(session, lambda: self._release(course_ids))
+
+    def _release(self, course_ids: List[int]):
+        for course_id in course_ids:
+            if course_id in self.seats:
+                self.seats[course_id] += 1
+
+    def invalidate_student(self, student_id: StudnentID):
+        self.summaries.pop(student_id, None)
+
+    def clear(self):
+        # Course, section and schedule changes can touch any student summary
+        self.summaries.clear()
+        self.courses.clear()
+        self.seats.clear()
+        self.seats_loaded_at = 0.0
+
+    # The *_on_commit variants run after the commit, so a concurrent request
+    # can not reload the rows being replaced, and a rollback drops nothing
+    def invalidate_student_on_commit(
+        self, session: AsyncSession, student_id: StudnentID
+    ):
+        self._after_commit(session, lambda: self.invalidate_student(student_id))
+
+    def clear_on_commit(self, session: AsyncSession):
+        self._after_commit(session, self.clear)
+
+    def _after_commit(self, session: AsyncSession, apply: Callable[[], None]):
+        sa.event.listen(
+            session.sync_session, "after_commit", lambda _: apply(), once=True
+        )
+
+
+@lru_cache()
+def get_reservation_service() -> ReservationService:
+    return ReservationService(get_session_maker())